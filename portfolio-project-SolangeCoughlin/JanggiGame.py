@@ -2,11 +2,18 @@
 # Date: 3/3/2021
 # Description: This file contains a class that allows two players to play Janggi, a strategy board game similar to western Chess
 
-import copy, pygame
+import time
+import uuid
+from board import *
 from Piece import *
+from recorder import Recorder
 
-# Initializing pygame module
-pygame.init()
+# The piece class for each piece type on the compact board
+PIECE_CLASSES = {piece_class._type: piece_class for piece_class in (General, Guard, Elephant, Horse, Chariot, Cannon,
+                                                                     Soldier)}
+
+# The starting position as a position string (see JanggiGame.to_position)
+START_POSITION = "REHA1AEHR/4G4/1C5C1/S1S1S1S1S/9/9/s1s1s1s1s/1c5c1/4g4/reha1aehr b UNFINISHED"
 
 
 class JanggiGame():
@@ -16,37 +23,62 @@ class JanggiGame():
     capture and removing the captured piece, moving pieces around the board and updating a piece location both on the board and
     in the piece's internal data member, checking for checkmate, and updating the status of the game if it changes."""
 
-    def __init__(self):
+    def __init__(self, verify_position_key=False, recorder=None, game_id=None, position=None):
         """Initialize the game by creating the board, creating the Piece objects, and 'placing' them on the board by placing markers on the board
-        and creating a dictionary containing all pieces and their current positions. Initializes the game to start on blue's turn"""
-
-        # The board is a list containing 10 lists. Each of the 10 lists represents a row of the game board. Each row contains 9 "empty" (three spaces) strings
-        # representing the columns of the game board.
-        self._board = [["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 0
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 1
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 2
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 3
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 4
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 5
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 6
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 7
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"],  # Row 8
-                       ["___", "___", "___", "___", "___", "___", "___", "___", "___"]]  # Row 9
+        and creating a dictionary containing all pieces and their current positions. Initializes the game to start on blue's turn.
+        If verify_position_key is True, the position key and the evaluation are recomputed from scratch after every move
+        and compared with the ones kept up to date as pieces move, which is slow but catches any move that updates them
+        wrongly.
+        The moves made with make_move are passed to the recorder, if one is given (see recorder.py), under the game ID.
+        A unique game ID is made up if none is given. If a position string is given (see to_position), the game starts
+        from that position instead of the starting position."""
+
+        # The board is stored as two arrays of 90 squares, numbered row by row from the Red side (see board.py).
+        # _squares holds the code of the piece on each square, or 0 if it is empty, and _square_pieces holds the piece's
+        # index into _piece_ids and _pieces so the piece on a square can be found without searching for it.
+        self._squares = bytearray(NUM_SQUARES)
+        self._square_pieces = bytearray(NUM_SQUARES)
 
         self._current_turn = "Blue"
         self._game_state = "UNFINISHED"
 
+        self._recorder = recorder if recorder is not None else Recorder()
+        self._game_id = game_id if game_id is not None else uuid.uuid4().hex
+
+        # The Zobrist key for the current position (see board.py), updated as pieces are placed and moved
+        self._position_key = 0
+        self._verify_position_key = verify_position_key
+
+        # The static evaluation of the position from Blue's side (see board.py), updated the same way as the position key
+        self._evaluation = -RED_DEOM
+
         self._Blue_Piece_List = ["b$1","b$2","b^1","b^2","b~1","b~2","b%1","b%2","b#1","b#2","b-1","b-2","b-3","b-4","b-5","b@"] # Original order
         self._Red_Piece_List = ["r$1","r$2","r^1","r^2","r~1","r~2","r%1","r%2","r#1","r#2","r-1","r-2","r-3","r-4","r-5","r@"] # Original order
         self._blue_start_pos = [[9,3], [9,5], [9,2], [9,7], [9,1], [9,6], [9,0], [9,8],[7,1],[7,7],[6,0],[6,2],[6,4],[6,6],[6,8],[8,4]] # Original order
         self._red_start_pos = [[0, 3], [0, 5], [0, 2], [0, 7], [0, 1], [0, 6], [0, 0], [0, 8], [2, 1], [2, 7], [3, 0], [3, 2], [3, 4], [3, 6], [3, 8],[1, 4]] # Original order
 
-        self._blue_palace_spaces = [[7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5]]
-        self._red_palace_spaces = [[0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5]]
+        # Index 0 is left unused so that a 0 in _square_pieces means the square is empty
+        self._piece_ids = [None] + self._Blue_Piece_List + self._Red_Piece_List
+        self._pieces = [None] * len(self._piece_ids)
+        self._piece_numbers = {self._piece_ids[index]: index for index in range(1, len(self._piece_ids))}
+
         self._Blue_Pieces = {}
         self._Red_Pieces = {}
         self._checking_pieces = {}
 
+        # Each move made with push (or make_move) adds a tuple (move, captured piece index, turn, game state, position
+        # key, evaluation) so that pop can take it back
+        self._undo_stack = []
+
+        # The Searcher used by best_move, made the first time it is needed and kept so its transposition table carries
+        # over from one move to the next
+        self._searcher = None
+
+        if position is not None:
+            self.set_up_position(position)
+            self.update_all_move_lists()
+            return
+
         for index in range(len(self._Blue_Piece_List)):
             piece_id = self._Blue_Piece_List[index]
             start_position = self._blue_start_pos[index]
@@ -131,33 +163,150 @@ class JanggiGame():
         # Once all pieces are on the board, create their initial move lists
         self.update_all_move_lists()
 
+    @classmethod
+    def from_position(cls, position, **kwargs):
+        """Receives a position string (see to_position), and any of the other arguments JanggiGame takes, and returns
+        a new game set up in that position. Raises a ValueError if the position string isn't valid."""
+
+        return cls(position=position, **kwargs)
+
+    def set_up_position(self, position):
+        """Receives a position string (see to_position) and puts the pieces on the empty board, and sets the turn and
+        the state of the game. Pieces are given the IDs they would have at the start, numbered in order of their
+        squares. Raises a ValueError if the position string isn't valid, including when a general or guard is outside
+        its palace or the player who just moved has left their general in check."""
+
+        fields = position.split()
+        if len(fields) != 3 or fields[1] not in ("b", "r") or fields[2] not in ("UNFINISHED", "BLUE_WON", "RED_WON"):
+            raise ValueError("position must be '<board> <b or r> <game state>': %r" % position)
+        ranks = fields[0].split("/")
+        if len(ranks) != ROWS:
+            raise ValueError("position must have %d ranks: %r" % (ROWS, position))
+
+        # The ranks are listed from rank 10 on the Blue side down to rank 1 on the Red side
+        placements = []
+        for rank_index, rank in enumerate(ranks):
+            row = ROWS - 1 - rank_index
+            col = 0
+            for letter in rank:
+                if letter in "123456789":
+                    col += int(letter)
+                elif letter.lower() in LETTER_TYPES and col < COLS:
+                    player = "Blue" if letter.isupper() else "Red"
+                    placements.append((player, LETTER_TYPES[letter.lower()], [row, col]))
+                    col += 1
+                else:
+                    raise ValueError("bad piece %r in rank %d of position %r" % (letter, row + 1, position))
+            if col != COLS:
+                raise ValueError("rank %d of position %r does not have %d squares" % (row + 1, position, COLS))
+
+        placements.sort(key=lambda placement: to_square(placement[2][0], placement[2][1]))
+        for player, piece_type, location in placements:
+            if piece_type in (GENERAL, GUARD) and to_square(location[0], location[1]) not in PALACES[TEAM_BITS[player]]:
+                raise ValueError("a %s general or guard is outside the palace in position %r" % (player, position))
+            piece_dict = self.get_piece_dictionary(player)
+            piece_list = self._Blue_Piece_List if player == "Blue" else self._Red_Piece_List
+
+            # Take the first unused ID for a piece of this type
+            piece_ids = [piece_id for piece_id in piece_list
+                         if SYMBOL_TYPES[piece_id[1]] == piece_type and piece_id not in piece_dict]
+            if not piece_ids:
+                raise ValueError("too many %s pieces of one type in position %r" % (player, position))
+            piece = PIECE_CLASSES[piece_type](player)
+            piece_dict[piece_ids[0]] = piece
+            self.put_piece_on_board(piece_ids[0], piece, location)
+
+        if "b@" not in self._Blue_Pieces or "r@" not in self._Red_Pieces:
+            raise ValueError("position must have a general for each player: %r" % position)
+
+        # Keep the piece dictionaries in the original piece order, as if the missing pieces had been captured
+        for piece_dict, piece_list in ((self._Blue_Pieces, self._Blue_Piece_List),
+                                       (self._Red_Pieces, self._Red_Piece_List)):
+            pieces = [(piece_id, piece_dict[piece_id]) for piece_id in piece_list if piece_id in piece_dict]
+            piece_dict.clear()
+            piece_dict.update(pieces)
+
+        if fields[1] == "r":
+            self.update_turn()
+        self._game_state = fields[2]
+
+        # The general of the player who isn't to move can't be in check, or the next move could capture it
+        waiting_general = self.get_piece_from_id("r@" if self._current_turn == "Blue" else "b@")
+        if self.square_attacked_by(waiting_general.get_square(), self._current_turn):
+            raise ValueError("the player not to move is in check in position %r" % position)
+
+    def to_position(self):
+        """Returns the current position as a string: the ranks of the board from rank 10 down to rank 1, separated by
+        slashes, then whose turn it is ('b' or 'r') and the state of the game. Each rank lists its pieces from column a
+        to column i, with upper case letters for Blue pieces and lower case for Red (see board.POSITION_LETTERS), and
+        the number of empty squares between them. The starting position is START_POSITION."""
+
+        ranks = []
+        for row in range(ROWS - 1, -1, -1):
+            rank = ""
+            empty_squares = 0
+            for square in range(row * COLS, row * COLS + COLS):
+                code = self._squares[square]
+                if code == EMPTY:
+                    empty_squares += 1
+                    continue
+                if empty_squares:
+                    rank += str(empty_squares)
+                    empty_squares = 0
+                letter = POSITION_LETTERS[code & TYPE_MASK]
+                rank += letter.upper() if code & BLUE else letter
+            if empty_squares:
+                rank += str(empty_squares)
+            ranks.append(rank)
+
+        turn = "b" if self._current_turn == "Blue" else "r"
+        return "%s %s %s" % ("/".join(ranks), turn, self._game_state)
+
     def put_piece_on_board(self, piece_id, piece_obj, start_pos):
         """Receives a piece ID, and piece object and a start position, and places the piece on the board in the given position"""
 
-        self._board[start_pos[0]][start_pos[1]] = piece_id
-        piece_obj.set_location(start_pos)
+        index = self._piece_numbers[piece_id]
+        square = to_square(start_pos[0], start_pos[1])
+        self._squares[square] = piece_obj.get_code()
+        self._square_pieces[square] = index
+        self._pieces[index] = piece_obj
+        self._position_key ^= ZOBRIST_KEYS[piece_obj.get_code()][square]
+        self._evaluation += SQUARE_VALUES[piece_obj.get_code()][square]
+        piece_obj.set_square(square)
 
     def update_all_move_lists(self):
         """Updates the move lists for all pieces"""
 
-        for piece_id in self._Red_Pieces:
-            piece = self.get_piece_from_id(piece_id)
+        for piece in self._Red_Pieces.values():
             piece.check_for_moves(self)
-            move_list = piece.get_move_list()
 
-        for piece_id in self._Blue_Pieces:
-            piece = self.get_piece_from_id(piece_id)
+        for piece in self._Blue_Pieces.values():
             piece.check_for_moves(self)
-            move_list = piece.get_move_list()
+
+    def update_move_lists(self, changed_squares, player):
+        """Receives a bitmask of the squares a move has changed and a player. Recomputes the move lists of the player's
+        pieces that were built from any of those squares, and leaves the rest alone. Pieces that are not on the board,
+        such as a piece captured by a move that is being tested, are skipped."""
+
+        for piece in self.get_piece_dictionary(player).values():
+            if piece.get_watched_squares() & changed_squares:
+                if self._pieces[self._square_pieces[piece.get_square()]] is piece:
+                    piece.check_for_moves(self)
+
+    def update_generals(self):
+        """Recomputes the move lists for both generals. A general can only move to a space that is safe, which can
+        depend on any square on the board, so the generals are recomputed after every move."""
+
+        for general in (self._Red_Pieces.get("r@"), self._Blue_Pieces.get("b@")):
+            if general is not None:
+                general.check_for_moves(self)
 
     def piece_belongs_to_turntaker(self,pos):
         """Returns true if the piece in the given position belongs to the player whose turn it is. Returns False otherwise."""
 
-        piece_id = self.whats_here(pos)
-        if piece_id == "___" or piece_id[0] != self._current_turn[0].lower():
+        if not on_board(pos[0], pos[1]):
             return False
-        else:
-            return True
+        return self._squares[to_square(pos[0], pos[1])] & TEAM_BITS[self._current_turn] != 0
 
     def make_move(self, start_pos, end_pos):
         """Receives a start position and end position, and checks if the move is valid. If it is, it executes the move
@@ -167,6 +316,8 @@ class JanggiGame():
         # Start the make_move process by parsing the input positions into board indexing format
         start = self.parse_position(start_pos)
         end = self.parse_position(end_pos)
+        if start is None or end is None:
+            return False
         if self._current_turn == "Blue" or self._current_turn == "blue":
             opponent = "Red"
         else:
@@ -179,28 +330,30 @@ class JanggiGame():
         if not self.piece_belongs_to_turntaker(start):
             return False
 
-        # Get the contents of the start position on the board
-        piece_id = self.whats_here(start)
-
         # Once it's established the piece belongs to the current player, check if the player is passing their turn. If they are, update the turn and end
+        # A player can't pass while in check, since that would leave their general in check
+        start_square = to_square(start[0], start[1])
         if start == end:
-            self.update_turn()
+            if self.is_in_check(self._current_turn):
+                return False
+            self.push((start_square, start_square))
+            self.record_move(start_pos, end_pos)
             return True
 
         # Once it's established the piece belongs to the current player, check if the end position is in range for the piece
-        piece = self.get_piece_from_id(piece_id)
-        available_moves = piece.check_for_moves(self)
-        if end not in available_moves:
+        piece = self.get_piece_at(start)
+        end_square = to_square(end[0], end[1])
+        if not piece.can_move_to(end_square):
             return False
 
         # At this point, move is almost valid! Check if the move would put the player's general in check...
 
         # Test the move to see if it puts the player's general in check. If is evaluates True, it puts the general in check, so return False, as it is not valid.
         # If it returns False, the move has not put the general in check, and test_move_for_check has already executed to move.
-        if self.move_causes_check(start, end, piece):
+        if self.move_causes_check(start_square, end_square, piece):
             return False
         else:
-            self.execute_move(start, end, piece)
+            self.push((start_square, end_square))
 
         # Check if the opponent is in checkmate after the move. If the opponent is in check and checkmate_check returns True, then player is in checkmate.
 
@@ -210,73 +363,246 @@ class JanggiGame():
             else:
                 self._game_state = "RED_WON"
 
+        self.record_move(start_pos, end_pos)
+        if self._game_state != "UNFINISHED":
+            self._recorder.end_game(self._game_id, self._game_state)
+        return True
+
+    def legal_moves(self):
+        """Yields the legal moves for the player whose turn it is, one at a time, as tuples (start square, end square) of
+        squares on the compact board. Moves that would leave the player's general in check are left out. Passing is
+        yielded last, as a move from the general's square to itself, unless the player is in check. Nothing is yielded
+        once the game is over.
+
+        The moves are checked as they are asked for, so a caller that stops early doesn't pay for the rest. Moves can
+        be made with push between moves, as long as they are taken back with pop before asking for the next one."""
+
+        if self._game_state != "UNFINISHED":
+            return
+
+        player = self._current_turn
+        if player == "Blue":
+            general = self.get_piece_from_id("b@")
+            opponent = "Red"
         else:
-            # Update the current turn and return True for a successful move
+            general = self.get_piece_from_id("r@")
+            opponent = "Blue"
+
+        # The pieces are copied first, since a move made between moves can capture and restore pieces
+        for piece in list(self.get_piece_dictionary(player).values()):
+            start_square = piece.get_square()
+            for end_square in piece.get_moves():
+                if not self.move_causes_check(start_square, end_square, piece):
+                    yield start_square, end_square
+
+        general_square = general.get_square()
+        if not self.square_attacked_by(general_square, opponent):
+            yield general_square, general_square
+
+    def legal_captures(self):
+        """Yields the legal moves that capture one of the opponent's pieces, for the player whose turn it is, in the
+        same form as legal_moves. Each piece looks only for the pieces it could capture (see Piece.generate_captures),
+        so this is much cheaper than picking the captures out of legal_moves. Nothing is yielded once the game is
+        over."""
+
+        if self._game_state != "UNFINISHED":
+            return
+
+        # The pieces are copied first, since a move made between moves can capture and restore pieces
+        for piece in list(self.get_piece_dictionary(self._current_turn).values()):
+            start_square = piece.get_square()
+            for end_square in piece.generate_captures(self):
+                if not self.move_causes_check(start_square, end_square, piece):
+                    yield start_square, end_square
+
+    def has_legal_move(self):
+        """Returns True if the player whose turn it is has a legal move, stopping at the first one found, and False
+        otherwise"""
+
+        for move in self.legal_moves():
+            return True
+        return False
+
+    def best_move(self, time_limit=None, depth=None, max_nodes=None):
+        """Searches for the best move for the player whose turn it is, within the given time limit in seconds, depth in
+        moves and number of nodes, and returns a dictionary with the move, its score, the principal variation and the
+        search statistics. See search.py, which is only imported when a computer opponent is wanted. The game keeps the
+        same Searcher for all of its moves, and the time taken to set it up on the first call counts against the time
+        limit."""
+
+        start_time = time.perf_counter()
+        if self._searcher is None:
+            from search import Searcher
+            self._searcher = Searcher()
+        return self._searcher.best_move(self, time_limit, depth, max_nodes, start_time)
+
+    def clone(self, recorder=None, game_id=None):
+        """Returns an independent copy of the game, in the same position and with the same moves to take back with pop,
+        for trying out moves without changing this game. Only the compact board and the pieces are copied: the tables
+        that never change are shared. Moves made in the copy are passed to the given recorder, or none if no recorder
+        is given, under the given game ID, or a new one. Unlike copy.deepcopy, this works with any recorder."""
+
+        game = object.__new__(self.__class__)
+        game.__dict__ = self.__dict__.copy()
+
+        game._squares = bytearray(self._squares)
+        game._square_pieces = bytearray(self._square_pieces)
+        game._recorder = recorder if recorder is not None else Recorder()
+        game._game_id = game_id if game_id is not None else uuid.uuid4().hex
+        game._undo_stack = list(self._undo_stack)
+        game._searcher = None
+
+        # Every piece is copied, including captured ones, since pop can put those back on the board. Pieces missing from
+        # a position the game was set up from are None.
+        game._pieces = [piece.clone() if piece is not None else None for piece in self._pieces]
+        game._Blue_Pieces = {piece_id: game._pieces[self._piece_numbers[piece_id]] for piece_id in self._Blue_Pieces}
+        game._Red_Pieces = {piece_id: game._pieces[self._piece_numbers[piece_id]] for piece_id in self._Red_Pieces}
+        game._checking_pieces = {piece_id: game._pieces[self._piece_numbers[piece_id]]
+                                 for piece_id in self._checking_pieces}
+        return game
+
+    def push(self, move):
+        """Receives a move as a tuple (start square, end square) of squares on the compact board, and makes it for the
+        current player without checking that it is legal. A move whose start and end are the same square passes the
+        turn. The move is added to the undo stack, so it can be taken back with pop."""
+
+        start_square, end_square = move
+        captured_index = 0
+        if start_square != end_square:
+            captured_index = self._square_pieces[end_square]
+        self._undo_stack.append((move, captured_index, self._current_turn, self._game_state, self._position_key,
+                                 self._evaluation))
+
+        if start_square != end_square:
+            piece = self._pieces[self._square_pieces[start_square]]
+            self.execute_move(start_square, end_square, piece)
+        self.update_turn()
+
+        if self._verify_position_key:
+            self.check_position_key()
+
+    def pop(self):
+        """Takes back the last move made with push or make_move. Puts back any piece it captured, and restores the turn
+        and the state of the game to what they were before the move. Returns the move that was taken back."""
+
+        move, captured_index, turn, game_state, position_key, evaluation = self._undo_stack.pop()
+        start_square, end_square = move
+
+        if start_square != end_square:
+            piece_index = self._square_pieces[end_square]
+            piece = self._pieces[piece_index]
+
+            # Move the piece back to the start position
+            self._squares[start_square] = self._squares[end_square]
+            self._square_pieces[start_square] = piece_index
+            piece.set_square(start_square)
+
+            # Put back whatever was at the end position. A captured piece's location was never changed.
+            if captured_index:
+                captured_piece = self._pieces[captured_index]
+                self._squares[end_square] = captured_piece.get_code()
+                self._square_pieces[end_square] = captured_index
+                self.restore_piece(self._piece_ids[captured_index], captured_piece)
+            else:
+                self._squares[end_square] = EMPTY
+                self._square_pieces[end_square] = 0
+
+            # Bring the move lists up to date, the same way execute_move does
+            changed_squares = (1 << start_square) | (1 << end_square)
             piece.check_for_moves(self)
-            self.update_all_move_lists()
-            self.update_turn()
+            self.update_move_lists(changed_squares, "Red")
+            self.update_move_lists(changed_squares, "Blue")
+            self.update_generals()
 
-        self.record_move(start_pos, end_pos)
-        return True
+        self._current_turn = turn
+        self._game_state = game_state
+        self._position_key = position_key
+        self._evaluation = evaluation
+
+        if self._verify_position_key:
+            self.check_position_key()
+        return move
 
     def record_move(self, start_pos, end_pos):
-        with open('move_list.txt','a') as outfile:
-            outfile.write(start_pos + '->' + end_pos + '\n')
+        """Passes a move that has been made to the game's recorder"""
+
+        self._recorder.record_move(self._game_id, start_pos, end_pos)
 
-    def execute_move(self, start, end, piece):
-        """Updates board and piece positions for valid moves"""
+    def execute_move(self, start_square, end_square, piece):
+        """Receives the start and end squares of a valid move on the compact board, and the piece being moved. Updates
+        board and piece positions for the move."""
 
-        if self.whats_here(end) != "___":
-            captured_piece_id = self.whats_here(end)
+        if self._squares[end_square] != EMPTY:
+            captured_piece_id = self._piece_ids[self._square_pieces[end_square]]
             self.remove_piece(captured_piece_id)
+            self._position_key ^= ZOBRIST_KEYS[self._squares[end_square]][end_square]
+            self._evaluation -= SQUARE_VALUES[self._squares[end_square]][end_square]
+
+        # Move the piece in the position key and the evaluation
+        code = self._squares[start_square]
+        self._position_key ^= ZOBRIST_KEYS[code][start_square] ^ ZOBRIST_KEYS[code][end_square]
+        self._evaluation += SQUARE_VALUES[code][end_square] - SQUARE_VALUES[code][start_square]
 
         # Move the piece to the end position
-        self._board[end[0]][end[1]] = self.whats_here(start)
+        self._squares[end_square] = self._squares[start_square]
+        self._square_pieces[end_square] = self._square_pieces[start_square]
 
         # Set the start position to empty
-        self._board[start[0]][start[1]] = "___"
+        self._squares[start_square] = EMPTY
+        self._square_pieces[start_square] = 0
 
         # Set the location of the piece
-        piece.set_location(end)
-
-    def move_causes_check(self, start, end, piece):
-        """Receives a list with a row and column describing a position for start and end position. Also receives a
+        piece.set_square(end_square)
+
+        # Bring the move lists up to date. Only the moved piece and the pieces that depend on the start or end square
+        # can have changed, apart from the generals.
+        changed_squares = (1 << start_square) | (1 << end_square)
+        piece.check_for_moves(self)
+        self.update_move_lists(changed_squares, "Red")
+        self.update_move_lists(changed_squares, "Blue")
+        self.update_generals()
+
+    def move_causes_check(self, start_square, end_square, piece):
+        """Receives the start and end squares of a move on the compact board. Also receives a
          piece object for the piece whose move is being tested. The method tests the move to determine if the move puts
          the general in check. If it does, returns True, else returns False."""
 
-        captured_piece_id = ""
         move_causes_check = False
 
-        if self.whats_here(end) != "___":
-            captured_piece_id = self.whats_here(end)
+        # Remember what is at the end position, so it can be restored if a piece is captured
+        captured_code = self._squares[end_square]
+        captured_index = self._square_pieces[end_square]
 
         # Move the piece to the end position
-        self._board[end[0]][end[1]] = self.whats_here(start)
+        self._squares[end_square] = self._squares[start_square]
+        self._square_pieces[end_square] = self._square_pieces[start_square]
 
         # Set the start position to empty
-        self._board[start[0]][start[1]] = "___"
+        self._squares[start_square] = EMPTY
+        self._square_pieces[start_square] = 0
 
         # Set the location of the piece
-        piece.set_location(end)
+        piece.set_square(end_square)
 
         if piece.get_team() == "Blue":
-            player = "Blue"
+            general = self.get_piece_from_id("b@")
+            opponent = "Red"
         else:
-            player = "Red"
+            general = self.get_piece_from_id("r@")
+            opponent = "Blue"
 
-        if self.is_in_check(player):
+        if self.square_attacked_by(general.get_square(), opponent):
             # If this is true, the move is not valid and should not be allowed. Undo the changes above and return True
             move_causes_check = True
 
-        self._board[start[0]][start[1]] = self._board[end[0]][
-            end[1]]  # Set the original start to match whats now at the end
-        piece.set_location(start)  # Change the location back to the start
+        # Set the original start to match whats now at the end
+        self._squares[start_square] = self._squares[end_square]
+        self._square_pieces[start_square] = self._square_pieces[end_square]
+        piece.set_square(start_square)  # Change the location back to the start
 
-        # If a piece was captured, restore it to the board
-        if captured_piece_id != "":
-            self._board[end[0]][end[1]] = captured_piece_id  # the location for this piece was never changed
-        else:
-            self._board[end[0]][end[1]] = "___"
+        # Restore whatever was at the end position. If a piece was captured, its location was never changed
+        self._squares[end_square] = captured_code
+        self._square_pieces[end_square] = captured_index
 
         return move_causes_check
 
@@ -287,221 +613,182 @@ class JanggiGame():
             self._current_turn = "Red"
         else:
             self._current_turn = "Blue"
+        self._position_key ^= RED_TO_MOVE_KEY
+
+    def position_key(self):
+        """Returns a 64-bit Zobrist key identifying the current position: where each piece is, and whose turn it is.
+        Positions that are the same have the same key, so it can be used for caches, repetition checks and
+        databases."""
+
+        if self._verify_position_key:
+            self.check_position_key()
+        return self._position_key
+
+    def check_position_key(self):
+        """Recomputes the position key and the evaluation from scratch and raises a RuntimeError if either doesn't match
+        the one kept up to date as pieces move"""
+
+        expected_key = compute_position_key(self._squares, self._current_turn == "Red")
+        if self._position_key != expected_key:
+            raise RuntimeError("position key %016x does not match the position (expected %016x)"
+                               % (self._position_key, expected_key))
+        expected_evaluation = compute_evaluation(self._squares)
+        if self._evaluation != expected_evaluation:
+            raise RuntimeError("evaluation %d does not match the position (expected %d)"
+                               % (self._evaluation, expected_evaluation))
+
+    def evaluate(self):
+        """Returns the static evaluation of the position for the player whose turn it is, in tenths of a point: the
+        material and square bonuses of the player's pieces (see board.py) less the opponent's, counting the deom for
+        Red. It is kept up to date as moves are made and taken back, so this costs the same in any position."""
+
+        if self._current_turn == "Blue":
+            return self._evaluation
+        return -self._evaluation
 
     def is_in_check(self, player):
-        """Receives a player (red or blue) and returns True if the player is in check and False if they are not in check."""
+        """Receives a player (red or blue) and returns True if the player is in check and False if they are not in check.
+        Records the pieces giving check in _checking_pieces."""
 
         player_in_check = False
         self._checking_pieces = {}
 
         if player == "Blue" or player == "blue":
             general = self.get_piece_from_id("b@")
+            opponent = "Red"
         else:
             general = self.get_piece_from_id("r@")
+            opponent = "Blue"
 
-        general_location = general.get_location()
+        for square in self.attackers_of(general.get_square(), opponent):
+            player_in_check = True
+            self._checking_pieces[self._piece_ids[self._square_pieces[square]]] = self._pieces[self._square_pieces[square]]
 
-        if player == "Blue" or player == "blue":
-            opponent_dict = self._Red_Pieces
-        else:
-            opponent_dict = self._Blue_Pieces
+        return player_in_check
 
-        for piece in opponent_dict:
-            this_piece = self.get_piece_from_id(piece)
-            this_piece.check_for_moves(self)
-            if general_location in this_piece.get_move_list():
-                player_in_check = True
-                self._checking_pieces[piece] = this_piece
+    def square_attacked_by(self, square, side):
+        """Receives a square on the compact board (see board.py) and a player, and returns True if any of the player's
+        pieces could move onto that square, and False otherwise"""
 
-        return player_in_check
+        for attacker in self.attackers_of(square, side):
+            return True
+        return False
+
+    def attackers_of(self, square, side):
+        """Receives a square on the compact board and a player, and yields the squares of the player's pieces that could
+        move onto that square. Instead of generating every move for the player's pieces, this works outward from the
+        square, looking only where an attacking piece could be."""
+
+        squares = self._squares
+        side_bit = TEAM_BITS[side]
+        # Cannons can't capture cannons
+        target_is_cannon = squares[square] & TYPE_MASK == CANNON
+
+        # Chariots and cannons along the rank, file and palace diagonals. The first piece on a line may be a chariot,
+        # and a cannon can attack from behind it unless it is a cannon too.
+        for ray in RAYS[square]:
+            screened = False
+            for ray_square in ray:
+                code = squares[ray_square]
+                if code == EMPTY:
+                    continue
+                if not screened:
+                    if code == side_bit | CHARIOT:
+                        yield ray_square
+                    if code & TYPE_MASK == CANNON:
+                        break
+                    screened = True
+                else:
+                    if code == side_bit | CANNON and not target_is_cannon:
+                        yield ray_square
+                    break
+
+        # Horses and elephants, as long as the squares they pass over are empty
+        for origin, leg in HORSE_ATTACKS[square]:
+            if squares[origin] == side_bit | HORSE and squares[leg] == EMPTY:
+                yield origin
+        for origin, first_leg, second_leg in ELEPHANT_ATTACKS[square]:
+            if squares[origin] == side_bit | ELEPHANT and squares[first_leg] == EMPTY and squares[second_leg] == EMPTY:
+                yield origin
+
+        # Soldiers, and the guards and general inside their palace
+        for origin in SOLDIER_ATTACKS[side_bit][square]:
+            if squares[origin] == side_bit | SOLDIER:
+                yield origin
+        for origin in PALACE_ATTACKS[side_bit][square]:
+            if squares[origin] == side_bit | GUARD or squares[origin] == side_bit | GENERAL:
+                yield origin
 
     def checkmate_check(self, player):
-        """This method is called as part of determining of the player is in checkmate. It tests if the general can't move,
-        and whether the piece putting the general in checkmate can be blocked or captured. If the general can move or the
-        checking piece can be blocked or captured, the method returns False. Otherwise, it returns True."""
-
-        checkmate = False
-        general_can_move = False
-        checking_piece_can_be_captured = False
-        checking_piece_can_be_blocked = False
+        """Receives a player and returns True if the player is checkmated: their general is in check and no move gets it
+        out of check. Returns False otherwise. Only moves that could get out of check are tried: moving the general,
+        capturing a checking piece, or blocking it. For a check by a cannon, blocking includes adding a second piece
+        between the cannon and the general or moving away the piece it jumps. A move has to deal with every checking
+        piece at once, and the search stops at the first move that works."""
 
         if player == "Blue" or player == 'blue':
             general = self.get_piece_from_id('b@')
             player_dict = self.get_piece_dictionary("Blue")
+            team_bit = BLUE
+            opponent = "Red"
         else:
             general = self.get_piece_from_id('r@')
             player_dict = self.get_piece_dictionary("Red")
+            team_bit = RED
+            opponent = "Blue"
 
-        # Check if the general has any valid moves. If the general does, test them to ensure they aren't protected by another piece.
-        general.check_for_moves(self)
-        general_moves = general.get_move_list()
-        if general_moves:
-            for move in general_moves:
-                if not self.move_causes_check(general.get_location(), move, general):
-                    general_can_move = True
-
-        # Check if any pieces can capture the piece putting the general in check
-        for checking_piece_id in self._checking_pieces:
-            checking_piece = self.get_piece_from_id(checking_piece_id)
-            checking_piece_location = checking_piece.get_location()
-
-            for player_piece_id in player_dict:
-                player_piece = self.get_piece_from_id(player_piece_id)
-                player_piece_location = player_piece.get_location()
-                player_piece_moves = player_piece.get_move_list()
-
-                if checking_piece_location in player_piece_moves:
-
-                    if not self.move_causes_check(player_piece_location, checking_piece_location, player_piece):
-                        checking_piece_can_be_captured = True
-
-            # Check if any pieces can block the piece causing the check WITHOUT putting their general in check
-            # Checking piece is a CANNON
-            # Check if a piece can move into the row/column of the cannon
-            # Check if a piece can move out of the row/column of the cannon
-            # Test the move to see if it can be made without endangering the general
-            if checking_piece_id[1] == '#':
-
-                # Determine if the piece and general share a row or a column
-                if checking_piece_location[0] == general.get_location()[0]:
-
-                    # Determine the "higher" and "lower" columns for comparison purposes
-                    checking_piece_col = checking_piece_location[1]
-                    general_col = general.get_location()[1]
-                    max_col = max(checking_piece_col, general_col)
-                    min_col = min(checking_piece_col, general_col)
-                    spaces_between_pieces = []
-                    space_count = min_col
-
-                    while space_count < max_col:
-                        space_count += 1
-                        if self._board[checking_piece_location[0]][space_count] == "___":
-                            spaces_between_pieces.append([checking_piece_location[0], space_count])
-                else:
-                    # If the general and the chariot are in the same column
-                    checking_piece_row = checking_piece_location[0]
-                    general_row = general.get_location()[0]
-                    max_row = max(checking_piece_row, general_row)
-                    min_row = min(checking_piece_row, general_row)
-                    spaces_between_pieces = []
-                    space_count = min_row
-
-                    while space_count < max_row:
-                        space_count += 1
-                        if self._board[space_count][checking_piece_location[1]] == "___":
-                            spaces_between_pieces.append([space_count, checking_piece_location[1]])
-
-                for piece_id in player_dict:
-                    piece = self.get_piece_from_id(piece_id)
-                    player_piece_moves = piece.get_move_list()
-
-                    # Scenario 2: If there is a piece between the checking piece and the general, try and move it
-                    if piece.get_location() in spaces_between_pieces:
-                        for move in player_piece_moves:
-                            if not self.move_causes_check(piece.get_location(), move, piece):
-                                checking_piece_can_be_blocked = True
-
-                    for move in player_piece_moves:
-
-                        # Scenario 1: If there is a move in the same row as the checking piece and between the general and the piece, see if you can move there
-                        if move in spaces_between_pieces:
-                            if not self.move_causes_check(piece.get_location(), move, piece):
-                                checking_piece_can_be_blocked = True
-
-            # Checking piece is a ELEPHANT
-            if checking_piece_id[1] == '~':
-                # Figure out what direction the piece needs to be blocked in
-                # Check if a piece can move into that space
-                # Test the move to see if it can be made without endangering the general
-
-                if (checking_piece_location[0] == (general.get_location()[0]) - 3):
-                    # Check in the space north of the elephant
-                    blocking_space = [checking_piece_location[0] - 1, checking_piece_location[1]]
-
-                elif (checking_piece_location[1] == (general.get_location()[1]) + 3):
-                    # look west
-                    blocking_space = [checking_piece_location[0], checking_piece_location[1] - 1]
-
-                else:
-                    blocking_space = [checking_piece_location[0], checking_piece_location[1] - 1]
-
-                for piece_id in player_dict:
-                    piece = self.get_piece_from_id(piece_id)
-                    player_piece_moves = piece.get_move_list()
-                    if blocking_space in player_piece_moves:
-                        if not self.move_causes_check(piece.get_location(), blocking_space, piece):
-                            checking_piece_can_be_blocked = True
-
-            # If the checking piece is a HORSE
-            if checking_piece_id[1] == '^':
-                # Figure out what direction the piece needs to be blocked in
-                # Check if a piece can move into that space
-                # Test the move to see if it can be made without endangering the general
-
-                if (checking_piece_location[0] == (general.get_location()[0]) - 2):
-                    # Check in the space north of the elephant
-                    blocking_space = [checking_piece_location[0] - 1, checking_piece_location[1]]
-
-                elif (checking_piece_location[1] == (general.get_location()[1]) + 2):
-                    # look west
-                    blocking_space = [checking_piece_location[0], checking_piece_location[1] - 1]
+        squares = self._squares
+        general_square = general.get_square()
+        checking_squares = list(self.attackers_of(general_square, opponent))
+        if not checking_squares:
+            return False
 
+        # Check if the general can step out of check, possibly by capturing the checking piece
+        for square in PALACE_MOVES[team_bit][general_square]:
+            if not squares[square] & team_bit:
+                if not self.move_causes_check(general_square, square, general):
+                    return False
+
+        # For each checking piece, work out the squares another piece could move to, or move away from, to stop the
+        # check: (end squares, start squares) as bitmasks. Every piece can be stopped by capturing it.
+        evasions = []
+        for checking_square in checking_squares:
+            piece_type = squares[checking_square] & TYPE_MASK
+            end_squares = 1 << checking_square
+            start_squares = 0
+            if piece_type == CHARIOT or piece_type == CANNON:
+                # The squares between the piece and the general
+                between_squares = PATH_MASKS[general_square][checking_square] ^ (1 << checking_square)
+                end_squares |= between_squares
+                if piece_type == CANNON:
+                    # Moving the piece the cannon jumps out of the way also stops the check
+                    start_squares = between_squares
+            elif piece_type == HORSE:
+                for origin, leg in HORSE_ATTACKS[general_square]:
+                    if origin == checking_square:
+                        end_squares |= 1 << leg
+            elif piece_type == ELEPHANT:
+                for origin, first_leg, second_leg in ELEPHANT_ATTACKS[general_square]:
+                    if origin == checking_square:
+                        end_squares |= (1 << first_leg) | (1 << second_leg)
+            evasions.append((end_squares, start_squares))
+
+        # Check if any other piece can make a move that stops every check without putting the general in check
+        for piece in list(player_dict.values()):
+            if piece is general:
+                continue
+            start_square = piece.get_square()
+            start_bit = 1 << start_square
+            for end_square in piece.get_moves():
+                end_bit = 1 << end_square
+                for end_squares, start_squares in evasions:
+                    if not (end_bit & end_squares or start_bit & start_squares):
+                        break
                 else:
-                    blocking_space = [checking_piece_location[0], checking_piece_location[1] - 1]
-
-                for piece_id in player_dict:
-                    piece = self.get_piece_from_id(piece_id)
-                    player_piece_moves = piece.get_move_list()
-                    if blocking_space in player_piece_moves:
-                        if not self.move_causes_check(piece.get_location(), blocking_space, piece):
-                            checking_piece_can_be_blocked = True
-
-            # Checking piece is a CHARIOT
-            if checking_piece_id[1] == '%':
-                if checking_piece_location[0] == general.get_location()[0]:
-
-                    # Determine the "higher" and "lower" columns for comparison purposes
-                    checking_piece_col = checking_piece_location[1]
-                    general_col = general.get_location()[1]
-                    max_col = max(checking_piece_col, general_col)
-                    min_col = min(checking_piece_col, general_col)
-                    spaces_between_pieces = []
-                    space_count = min_col
-
-                    while space_count < max_col:
-                        space_count += 1
-                        if self._board[checking_piece_location[0]][space_count] == "___":
-                            spaces_between_pieces.append([checking_piece_location[0], space_count])
-                else:
-                    # If the general and the chariot are in the same column
-                    checking_piece_row = checking_piece_location[0]
-                    general_row = general.get_location()[0]
-                    max_row = max(checking_piece_row, general_row)
-                    min_row = min(checking_piece_row, general_row)
-                    spaces_between_pieces = []
-                    space_count = min_row
-
-                    while space_count < max_row:
-                        space_count += 1
-                        if self._board[space_count][checking_piece_location[1]] == "___":
-                            spaces_between_pieces.append([space_count,checking_piece_location[1]])
-
-                for piece_id in player_dict:
-                    piece = self.get_piece_from_id(piece_id)
-                    player_piece_moves = piece.get_move_list()
+                    if not self.move_causes_check(start_square, end_square, piece):
+                        return False
 
-                    for move in player_piece_moves:
-
-                        # Scenario 1: If there is a move in the same row as the checking piece and between the general and the piece, see if you can move there
-                        if move in spaces_between_pieces:
-                            if not self.move_causes_check(piece.get_location(), move, piece):
-                                checking_piece_can_be_blocked = True
-
-        # If all the things are True, than checkmate is True
-        if (not general_can_move) and (not checking_piece_can_be_captured) and (not checking_piece_can_be_blocked):
-            checkmate = True
-
-        return checkmate
+        return True
 
     def get_piece_dictionary(self, player):
         """Returns the piece dictionary for the player passed to the method"""
@@ -516,21 +803,42 @@ class JanggiGame():
 
         return self._game_state
 
+    def get_game_id(self):
+        """Returns the ID the game's moves are recorded under"""
+
+        return self._game_id
+
     def get_current_turn(self):
         """Returns whose turn it currently is"""
 
         return self._current_turn
 
+    def get_board(self):
+        """Returns the board in its original readable form: a list of 10 rows, each a list of 9 strings holding the ID
+        of the piece on that space, or "___" if the space is empty. The board is rebuilt from the compact board each
+        time, so changing the returned lists does not change the game."""
+
+        return [[self.whats_here([row, col]) for col in range(COLS)] for row in range(ROWS)]
+
+    def get_squares(self):
+        """Returns the compact board, an array of 90 piece codes (see board.py). Pieces read it to find their moves."""
+
+        return self._squares
+
     def print_board(self):
         """Prints out the board"""
 
-        for row in self._board:
+        for row in self.get_board():
             print(row)
 
     def parse_position(self, pos):
         """Receives a string representing a board position and breaks it into to integer values in a list. The first value is converted to a number from the letter
         at the start of the position, and the second value is the number portion of the string converted to an integer. This method returns a list containing the row
-        and column of the position in a format compatible with the board. The first value represents the row, and the second value represents the column"""
+        and column of the position in a format compatible with the board. The first value represents the row, and the second value represents the column.
+        Returns None if the string isn't the name of a square on the board, from a1 to i10."""
+
+        if pos not in SQUARE_NUMBERS:
+            return None
 
         # The first letter in the string represents the column. Convert this to a number using ord() to get the Unicode representation and subtract 97 (a = 97 in Unicode,
         # so column a would result in column 0)
@@ -542,6 +850,14 @@ class JanggiGame():
 
         return [row, col]
 
+    def get_piece_at(self, location):
+        """Receives a list containing a row and a column, and returns the object for the piece on that space, or None if
+        the space is empty or off the board"""
+
+        if not on_board(location[0], location[1]):
+            return None
+        return self._pieces[self._square_pieces[to_square(location[0], location[1])]]
+
     def get_piece_from_id(self, piece_id):
         """Receives a string representing the piece on the board, and returns the object for that piece"""
 
@@ -558,11 +874,30 @@ class JanggiGame():
         else:
             del self._Blue_Pieces[piece_id]
 
+    def restore_piece(self, piece_id, piece_obj):
+        """Receives a piece_id and its piece object, and puts a captured piece back in the dictionary of pieces in the
+        game. The dictionary is kept in the original piece order."""
+
+        if piece_id[0] == "b":
+            piece_dict = self._Blue_Pieces
+            piece_list = self._Blue_Piece_List
+        else:
+            piece_dict = self._Red_Pieces
+            piece_list = self._Red_Piece_List
+
+        piece_dict[piece_id] = piece_obj
+        pieces = [(this_id, piece_dict[this_id]) for this_id in piece_list if this_id in piece_dict]
+        piece_dict.clear()
+        piece_dict.update(pieces)
+
     def whats_here(self, location):
         """Receives a list containing a row and a column (representing a board space) and returns the contents of the space on the board.
         The method is called by pieces in the game to allow them to tell if they can move"""
 
-        return self._board[location[0]][location[1]]
+        piece_id = self._piece_ids[self._square_pieces[to_square(location[0], location[1])]]
+        if piece_id is None:
+            return "___"
+        return piece_id
 
 def main():
     pass
@@ -1,9 +1,545 @@
+import io
+import os
+import sys
+import tempfile
 import unittest
-from JanggiGame import JanggiGame, Piece, General, Horse, Chariot, Soldier, Elephant, Cannon, Guard
+from JanggiGame import JanggiGame, START_POSITION, Piece, General, Horse, Chariot, Soldier, Elephant, Cannon, Guard
+from board import to_square, compute_evaluation, PIECE_VALUES, TYPE_MASK
+from perft import perft, divide, load_position, parallel_perft, parallel_divide, SAMPLE_GAME
+from recorder import MemoryRecorder, FileRecorder
+from archive import ArchiveWriter, ArchiveReader, convert_text_records
+from validate import validate_files
+from selfplay import run_games
+from search import Searcher, best_move, MATE_SCORE
+from ordering import MoveOrdering
+from transposition import TranspositionTable, ENTRY_BYTES, EXACT, LOWER_BOUND, UPPER_BOUND
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class MyTestCase(unittest.TestCase):
 
+    def test_rules_engine_is_headless(self):
+        """The rules engine should not pull in pygame or the piece images"""
+        Janggi = JanggiGame()
+        self.assertNotIn("pygame", sys.modules)
+        self.assertNotIn("constants", sys.modules)
+
+    def test_pieces_have_no_dict(self):
+        """Pieces should keep their fields in slots, so they don't each carry a __dict__"""
+        for piece in JanggiGame()._pieces[1:]:
+            self.assertFalse(hasattr(piece, "__dict__"))
+
+    def test_compact_board(self):
+        """The readable board should be kept in step with the compact board"""
+        Janggi = JanggiGame()
+        self.assertEqual(Janggi.whats_here([8, 4]), "b@")
+        self.assertEqual(Janggi.whats_here([0, 0]), "r%1")
+        self.assertEqual(Janggi.whats_here([4, 4]), "___")
+        self.assertEqual(Janggi.get_board()[9], ["b%1", "b~1", "b^1", "b$1", "___", "b$2", "b~2", "b^2", "b%2"])
+        Janggi.make_move("c7", "c6")
+        Janggi.make_move("c4", "c5")
+        Janggi.make_move("c6", "c5") # Blue soldier captures a red soldier
+        self.assertEqual(Janggi.whats_here([4, 2]), "b-2")
+        self.assertEqual(Janggi.whats_here([5, 2]), "___")
+        self.assertIs(Janggi.get_piece_at([4, 2]), Janggi.get_piece_from_id("b-2"))
+        self.assertNotIn("r-2", Janggi.get_piece_dictionary("Red"))
+
+    def test_off_board_squares(self):
+        """Positions off the board should be refused rather than wrapping round onto another square"""
+        Janggi = JanggiGame()
+        start_board = Janggi.get_board()
+        for start_pos, end_pos in [("j6", "j5"), ("j3", "j3"), ("a7", "j7"), ("a0", "a1"), ("a7", "a0"),
+                                   ("a11", "a10"), ("e9", "e11"), ("e", "e9"), ("e09", "e8"), ("E7", "E6")]:
+            self.assertEqual(Janggi.make_move(start_pos, end_pos), False)
+        self.assertEqual(Janggi.get_board(), start_board)
+        self.assertEqual(Janggi.get_current_turn(), "Blue")
+        self.assertIsNone(Janggi.parse_position("j6"))
+        self.assertEqual(Janggi.parse_position("i10"), [9, 8])
+        self.assertIsNone(Janggi.get_piece_at([5, 9]))
+        self.assertIsNone(Janggi.get_piece_at([-1, 0]))
+        self.assertEqual(Janggi.piece_belongs_to_turntaker([10, 0]), False)
+
+    def test_incremental_move_lists(self):
+        """The move lists kept up to date after each move should match freshly computed ones"""
+        Janggi = JanggiGame()
+        for start_pos, end_pos in SAMPLE_GAME[:10]:
+            self.assertEqual(Janggi.make_move(start_pos, end_pos), True)
+            for player in ("Blue", "Red"):
+                for piece in Janggi.get_piece_dictionary(player).values():
+                    kept_moves = sorted(piece.get_moves())
+                    self.assertEqual(kept_moves, sorted(piece.check_for_moves(Janggi)))
+                    self.assertEqual([square for square in range(90) if piece.can_move_to(square)], kept_moves)
+
+    def test_push_pop(self):
+        """Moves taken back with pop should restore captured pieces, the turn and the game state"""
+        Janggi = JanggiGame()
+        start_board = Janggi.get_board()
+        Janggi.make_move("c7", "c6")
+        Janggi.make_move("c4", "c5")
+        Janggi.push((to_square(5, 2), to_square(4, 2))) # Blue soldier captures a red soldier
+        self.assertNotIn("r-2", Janggi.get_piece_dictionary("Red"))
+        self.assertEqual(Janggi.get_current_turn(), "Red")
+        Janggi.push((to_square(1, 4), to_square(1, 4))) # Red passes
+        self.assertEqual(Janggi.pop(), (to_square(1, 4), to_square(1, 4)))
+        self.assertEqual(Janggi.pop(), (to_square(5, 2), to_square(4, 2)))
+        self.assertEqual(Janggi.whats_here([4, 2]), "r-2")
+        self.assertEqual(list(Janggi.get_piece_dictionary("Red"))[11], "r-2") # Back in its original place
+        self.assertEqual(Janggi.get_current_turn(), "Blue")
+        Janggi.pop()
+        Janggi.pop()
+        self.assertEqual(Janggi.get_board(), start_board)
+        self.assertEqual(Janggi.get_piece_from_id("b-2").get_move_list(), [[5, 2], [6, 3], [6, 1]])
+
+        # Taking back a winning move puts the game back in play
+        Janggi = JanggiGame()
+        for start_pos, end_pos in SAMPLE_GAME:
+            Janggi.make_move(start_pos, end_pos)
+        self.assertEqual(Janggi.get_game_state(), "BLUE_WON")
+        Janggi.pop()
+        self.assertEqual(Janggi.get_game_state(), "UNFINISHED")
+        self.assertEqual(Janggi.get_current_turn(), "Blue")
+
+    def test_position_key(self):
+        """The same position should have the same key however it was reached"""
+        Janggi = JanggiGame(verify_position_key=True)
+        start_key = Janggi.position_key()
+        Janggi.make_move("c10", "d8")
+        Janggi.make_move("c1", "d3")
+        Janggi.make_move("h10", "g8")
+        after_moves = Janggi.position_key()
+
+        Janggi_2 = JanggiGame(verify_position_key=True)
+        Janggi_2.make_move("h10", "g8")
+        Janggi_2.make_move("c1", "d3")
+        Janggi_2.make_move("c10", "d8")
+        self.assertEqual(Janggi_2.position_key(), after_moves)
+
+        Janggi_2.make_move("e2", "e2") # Red pass, only the turn changes
+        self.assertNotEqual(Janggi_2.position_key(), after_moves)
+        Janggi_2.pop()
+        self.assertEqual(Janggi_2.position_key(), after_moves)
+        Janggi_2.pop()
+        Janggi_2.pop()
+        Janggi_2.pop()
+        self.assertEqual(Janggi_2.position_key(), start_key)
+
+        # The self-check notices a key that is out of step with the board
+        Janggi._position_key ^= 1
+        self.assertRaises(RuntimeError, Janggi.position_key)
+
+    def test_legal_moves(self):
+        Janggi = JanggiGame()
+        moves = Janggi.legal_moves()
+        self.assertEqual(next(moves), (to_square(9, 3), to_square(8, 3))) # Moves are generated one at a time
+        moves = list(Janggi.legal_moves())
+        self.assertEqual(len(moves), 32)
+        self.assertEqual(moves[-1], (to_square(8, 4), to_square(8, 4))) # Passing comes last
+        self.assertEqual(Janggi.has_legal_move(), True)
+
+        # Red is in check from the cannon on e5, so it can't pass and only has moves that get out of check
+        Janggi = load_position("check")
+        self.assertEqual(Janggi.make_move("e2", "e2"), False)
+        self.assertNotIn((to_square(1, 4), to_square(1, 4)), list(Janggi.legal_moves()))
+        self.assertIn((to_square(3, 4), to_square(4, 4)), list(Janggi.legal_moves())) # Soldier captures the cannon
+        self.assertNotIn((to_square(1, 4), to_square(2, 4)), list(Janggi.legal_moves())) # Still in the cannon's line
+
+    def test_checkmate_detection(self):
+        """checkmate_check should agree with whether the player in check has any legal move"""
+        Janggi = load_position("check")
+        self.assertEqual(Janggi.checkmate_check("Red"), False) # The soldier on e4 can capture the cannon
+        self.assertEqual(Janggi.checkmate_check("Blue"), False) # Blue is not in check
+
+        Janggi = JanggiGame()
+        for start_pos, end_pos in SAMPLE_GAME[:26]:
+            Janggi.make_move(start_pos, end_pos)
+        Janggi.push((to_square(4, 3), to_square(3, 3))) # The chariot captures the elephant on d4, without ending the game
+        self.assertEqual(Janggi.checkmate_check("Red"), True)
+        self.assertEqual(Janggi.has_legal_move(), False)
+
+    def test_recorders(self):
+        """Moves and results should be recorded under each game's ID"""
+        recorder = MemoryRecorder()
+        Janggi = JanggiGame(recorder=recorder, game_id="first")
+        Janggi_2 = JanggiGame(recorder=recorder, game_id="second")
+        Janggi.make_move("c7", "c6")
+        Janggi_2.make_move("e9", "e9") # Passes are recorded too
+        Janggi.make_move("b1", "b1")
+        Janggi.make_move("b1", "b1") # Not Red's turn, so not recorded
+        self.assertEqual(recorder.get_game_ids(), ["first", "second"])
+        self.assertEqual(recorder.get_moves("first"), [("c7", "c6"), ("b1", "b1")])
+        self.assertEqual(recorder.get_moves("second"), [("e9", "e9")])
+        self.assertEqual(recorder.get_result("first"), "UNFINISHED")
+        self.assertNotEqual(JanggiGame().get_game_id(), JanggiGame().get_game_id())
+
+        # Every game to one stream, flushed when the game ends or the recorder is closed
+        stream = io.StringIO()
+        recorder = FileRecorder(stream, flush_every=2)
+        Janggi = JanggiGame(recorder=recorder, game_id="g1")
+        for start_pos, end_pos in SAMPLE_GAME:
+            Janggi.make_move(start_pos, end_pos)
+        JanggiGame(recorder=recorder, game_id="g2").make_move("a7", "a6")
+        recorder.close()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], "g1 c10->d8")
+        self.assertEqual(lines[27], "g1 BLUE_WON")
+        self.assertEqual(lines[28:], ["g2 a7->a6"])
+
+        # A file for each game
+        with tempfile.TemporaryDirectory() as directory:
+            recorder = FileRecorder(os.path.join(directory, "{game_id}.txt"))
+            JanggiGame(recorder=recorder, game_id="g3").make_move("a7", "a6")
+            JanggiGame(recorder=recorder, game_id="g4").make_move("i7", "i6")
+            recorder.close()
+            with open(os.path.join(directory, "g4.txt")) as infile:
+                self.assertEqual(infile.read(), "g4 i7->i6\n")
+            self.assertEqual(sorted(os.listdir(directory)), ["g3.txt", "g4.txt"])
+
+            # Game IDs are escaped, so they can't name a file outside the directory
+            games_directory = os.path.join(directory, "games")
+            os.mkdir(games_directory)
+            recorder = FileRecorder(os.path.join(games_directory, "{game_id}.txt"))
+            JanggiGame(recorder=recorder, game_id="../escaped").make_move("a7", "a6")
+            JanggiGame(recorder=recorder, game_id="a/b.c").make_move("a7", "a6")
+            recorder.close()
+            self.assertEqual(sorted(os.listdir(directory)), ["g3.txt", "g4.txt", "games"])
+            self.assertEqual(sorted(os.listdir(games_directory)), ["%2E%2E%2Fescaped.txt", "a%2Fb%2Ec.txt"])
+
+            # An error in the writer thread is raised from close, after the other games are written
+            recorder = FileRecorder(os.path.join(directory, "{game_id}", "moves.txt"))
+            os.mkdir(os.path.join(directory, "g5"))
+            JanggiGame(recorder=recorder, game_id="missing").make_move("a7", "a6")
+            JanggiGame(recorder=recorder, game_id="g5").make_move("a7", "a6")
+            self.assertRaises(FileNotFoundError, recorder.close)
+            with open(os.path.join(directory, "g5", "moves.txt")) as infile:
+                self.assertEqual(infile.read(), "g5 a7->a6\n")
+
+    def test_archive(self):
+        """Games should come back out of an archive as they went in, and replay through the game"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.jga")
+            with ArchiveWriter(path) as writer:
+                writer.write_game([(to_square(6, 0), to_square(5, 0)), (to_square(1, 4), to_square(1, 4))], "g1")
+                writer.write_game([(to_square(3, 2), to_square(4, 2))], "g2", metadata={"event": "test"})
+            with ArchiveReader(path) as reader:
+                self.assertEqual(reader.get_game_count(), 2)
+                games = list(reader)
+            self.assertEqual(games[0].get_move_names(), [("a7", "a6"), ("e2", "e2")])
+            self.assertEqual(games[1].get_metadata(), {"event": "test", "game_id": "g2"})
+            self.assertEqual(games[0].replay()[1], None)
+            self.assertEqual(games[1].replay()[1], 0) # Blue moves first
+
+            # Lines from the recorder, and older lines with every game appended and passes left out
+            text_path = os.path.join(directory, "move_list.txt")
+            with open(text_path, "w") as outfile:
+                outfile.write("g3 a7->a6\ng3 e2->e2\ng3 i7->i6\n")
+                outfile.write("".join("%s->%s\n" % move for move in SAMPLE_GAME) + "a7->a6\nc7->c6\n")
+            self.assertEqual(convert_text_records(text_path, path), 3)
+            with ArchiveReader(path) as reader:
+                games = list(reader)
+            self.assertEqual([game.get_game_id() for game in games], ["move_list-1", "g3", "move_list-2"])
+            self.assertEqual([game.get_result() for game in games], ["BLUE_WON", "UNFINISHED", "UNFINISHED"])
+            self.assertEqual(games[2].get_move_names(), [("a7", "a6"), ("e2", "e2"), ("c7", "c6")])
+            Janggi, illegal_move = games[0].replay()
+            self.assertEqual((Janggi.get_game_state(), illegal_move), ("BLUE_WON", None))
+
+            # Squares off the board, and lines that are neither moves nor results, are errors
+            with open(text_path, "w") as outfile:
+                outfile.write("g4 j6->j5\n")
+            self.assertRaises(ValueError, convert_text_records, text_path, path)
+            with open(text_path, "w") as outfile:
+                outfile.write("g4 a7->a6\ng4 DRAWN\n")
+            with self.assertRaisesRegex(ValueError, "move_list.txt, line 2"):
+                convert_text_records(text_path, path)
+
+    def test_validate_files(self):
+        """Replaying recorded games should report illegal moves and results that don't match"""
+        with tempfile.TemporaryDirectory() as directory:
+            archive_path = os.path.join(directory, "games.jga")
+            with ArchiveWriter(archive_path) as writer:
+                for index in range(5):
+                    writer.write_game([(to_square(6, 0), to_square(5, 0))], "ok%d" % index)
+                writer.write_game([(to_square(3, 0), to_square(4, 0))], "red_first")
+            text_path = os.path.join(directory, "games.txt")
+            with open(text_path, "w") as outfile:
+                outfile.write("g1 c7->c6\ng1 BLUE_WON\ng2 a7->a6\ng2 a4->a5\n")
+                outfile.write("off_board j6->j5\noff_board UNFINISHED\n") # Not the soldier on a7
+
+            for workers in (1, 2):
+                output = io.StringIO()
+                totals = validate_files([archive_path, text_path], workers=workers, batch_size=2, output=output)
+                self.assertEqual((totals["games"], totals["moves"], totals["illegal"], totals["mismatched"]),
+                                 (9, 8, 2, 1))
+                self.assertEqual(totals["states"], {"UNFINISHED": 9})
+                self.assertIn("red_first: illegal move 0 a4->a5", output.getvalue())
+                self.assertIn("off_board: illegal move 0 j6->j5", output.getvalue())
+                self.assertIn("g1: ended UNFINISHED, recorded as BLUE_WON", output.getvalue())
+
+    def test_selfplay(self):
+        """Self-play should only pick moves make_move accepts, and seeded games should play out the same every time"""
+        summary = run_games(4, "random", "greedy", seed=7, max_moves=30, workers=1)
+        self.assertEqual(summary["rejected_moves"], 0)
+        self.assertEqual(summary["games"], sum(summary["results"].values()))
+        parallel_summary = run_games(4, "random", "greedy", seed=7, max_moves=30, workers=2)
+        self.assertEqual([game["moves"] for game in parallel_summary["games_played"]],
+                         [game["moves"] for game in summary["games_played"]])
+        self.assertEqual(run_games(1, "first", "first", max_moves=10, workers=1)["total_moves"], 10)
+
+    def test_positions(self):
+        """Games set up from a position string should match the games they were exported from"""
+        self.assertEqual(JanggiGame().to_position(), START_POSITION)
+        Janggi = JanggiGame.from_position(START_POSITION)
+        self.assertEqual(Janggi.get_board(), JanggiGame().get_board())
+        self.assertEqual(Janggi.position_key(), JanggiGame().position_key())
+
+        for name in ("check", "middlegame"):
+            Janggi = load_position(name)
+            position = Janggi.to_position()
+            loaded = JanggiGame.from_position(position, verify_position_key=True)
+            self.assertEqual(loaded.to_position(), position)
+            self.assertEqual(loaded.position_key(), Janggi.position_key())
+            self.assertEqual(loaded.get_current_turn(), Janggi.get_current_turn())
+            self.assertEqual(sorted(loaded.legal_moves()), sorted(Janggi.legal_moves()))
+            self.assertEqual(perft(loaded, 2), perft(Janggi, 2))
+
+        # Pieces are numbered in order of their squares, and missing pieces count as captured
+        Janggi = JanggiGame.from_position("4G4/9/9/9/9/9/9/9/4g4/1r5r1 r UNFINISHED")
+        self.assertEqual(Janggi.get_board()[0][7], "r%2")
+        self.assertEqual(list(Janggi.get_piece_dictionary("Red")), ["r%1", "r%2", "r@"])
+        self.assertTrue(Janggi.make_move("b1", "b10"))
+        self.assertTrue(Janggi.is_in_check("blue"))
+        self.assertEqual(Janggi.to_position(), "1r2G4/9/9/9/9/9/9/9/4g4/7r1 b UNFINISHED")
+        Janggi = JanggiGame.from_position("1r2G4/9/9/9/9/9/9/9/4g4/7r1 b RED_WON")
+        self.assertEqual(list(Janggi.legal_moves()), [])
+        self.assertFalse(Janggi.make_move("e10", "e9"))
+
+        for position in ("4G4/9/9/9/9/9/9/9/9/9 b UNFINISHED", "4G4/9/9/9/9/9/9/9/4g4/9 x UNFINISHED",
+                         "4G4/9/9/9/9/9/9/9/4g4 b UNFINISHED", "4G5/9/9/9/9/9/9/9/4g4/9 b UNFINISHED",
+                         "4G3X/9/9/9/9/9/9/9/4g4/9 b UNFINISHED", "GGG6/9/9/9/9/9/9/9/4g4/9 b UNFINISHED",
+                         "4G4/9/9/9/9/9/9/9/4g4/0r8 r UNFINISHED", # A run of no empty squares
+                         "G8/9/9/9/9/9/9/9/9/8g r UNFINISHED", # Generals outside their palaces
+                         "3aG4/9/9/9/9/9/9/9/4g4/9 b UNFINISHED", # A red guard in the blue palace
+                         "4G4/9/9/9/9/9/9/9/4g4/4R4 b UNFINISHED"): # Red's general can be captured on Blue's move
+            with self.assertRaises(ValueError):
+                JanggiGame.from_position(position)
+
+    def test_clone(self):
+        """A cloned game should play on independently of the game it was cloned from"""
+        Janggi = load_position("check")
+        position = Janggi.to_position()
+        recorder = MemoryRecorder()
+        branch = Janggi.clone(recorder=recorder, game_id="branch")
+        self.assertEqual(branch.to_position(), position)
+        self.assertEqual(branch.position_key(), Janggi.position_key())
+        self.assertEqual(sorted(branch.legal_moves()), sorted(Janggi.legal_moves()))
+
+        self.assertTrue(branch.make_move("e4", "e5")) # The soldier takes the checking cannon
+        self.assertTrue(branch.make_move("c7", "c6"))
+        self.assertEqual(recorder.get_moves("branch"), [("e4", "e5"), ("c7", "c6")])
+        self.assertEqual(Janggi.to_position(), position)
+        self.assertTrue(Janggi.is_in_check("red"))
+        self.assertEqual(perft(Janggi, 2), 284)
+
+        # The clone can take back moves made before it was cloned, and captured pieces come back
+        for _ in range(7):
+            branch.pop()
+        self.assertEqual(branch.get_board(), JanggiGame().get_board())
+        self.assertEqual(Janggi.to_position(), position)
+        self.assertEqual(JanggiGame.from_position(position).clone().to_position(), position)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_moves(self):
+        """Batched move generation should find the same legal moves and checks as the rules engine"""
+        from batch_moves import boards_from_games, legal_move_arrays, legal_move_masks
+        games = [JanggiGame(), load_position("check"), load_position("middlegame"),
+                 JanggiGame.from_position("4G4/9/9/9/9/9/9/9/4g4/1r5r1 r UNFINISHED")]
+        boards, red_to_move = boards_from_games(games)
+        self.assertEqual(boards.shape, (4, 10, 9))
+        positions, starts, ends, in_check = legal_move_arrays(boards, red_to_move, chunk_size=3)
+        for index, game in enumerate(games):
+            moves = list(zip(starts[positions == index].tolist(), ends[positions == index].tolist()))
+            self.assertEqual(moves, sorted(game.legal_moves()))
+            self.assertEqual(bool(in_check[index]), game.is_in_check(game.get_current_turn()))
+        self.assertEqual(in_check.tolist(), [False, True, False, False])
+
+        masks, in_check = legal_move_masks(boards, red_to_move)
+        self.assertEqual(masks.shape, (4, 90, 90))
+        self.assertEqual(int(masks[0].sum()), 32)
+        self.assertTrue(masks[1, to_square(3, 4), to_square(4, 4)]) # The soldier can take the checking cannon
+
+    def test_search(self):
+        """The search should find a mate in one, take free material, keep to its limits and leave the game as it was"""
+        Janggi = JanggiGame()
+        for start_pos, end_pos in SAMPLE_GAME[:26]:
+            Janggi.make_move(start_pos, end_pos)
+        position = Janggi.to_position()
+        result = Janggi.best_move(depth=3)
+        self.assertEqual(result["move"], (to_square(4, 3), to_square(3, 3))) # The chariot on d5 mates on d4
+        self.assertEqual(result["pv"], [result["move"]])
+        self.assertEqual(result["score"], MATE_SCORE - 1)
+        self.assertEqual(Janggi.to_position(), position)
+
+        # Red is in check from the cannon on e5, and the soldier on e4 can take it
+        Janggi = load_position("check")
+        result = best_move(Janggi, depth=2)
+        self.assertEqual(result["move"], (to_square(3, 4), to_square(4, 4)))
+        self.assertEqual(result["depth"], 2)
+        self.assertEqual([iteration["depth"] for iteration in result["iterations"]], [1, 2])
+        self.assertEqual(len(result["pv"]), 2)
+        self.assertGreater(result["nodes"], 0)
+
+        # The first depth is always finished, however tight the limits
+        result = best_move(load_position("middlegame"), max_nodes=1)
+        self.assertEqual(result["depth"], 1)
+        self.assertIn(result["move"], list(load_position("middlegame").legal_moves()))
+        result = best_move(load_position("middlegame"), time_limit=0.05)
+        self.assertGreaterEqual(result["depth"], 1)
+        self.assertLess(result["seconds"], 1)
+
+        # A game keeps the same Searcher from one move to the next, but a copy of the game gets its own
+        Janggi = load_position("opening")
+        first = Janggi.best_move(depth=3)
+        searcher = Janggi._searcher
+        again = Janggi.best_move(depth=3)
+        self.assertIs(Janggi._searcher, searcher)
+        self.assertEqual((again["move"], again["score"]), (first["move"], first["score"]))
+        self.assertLess(again["nodes"], first["nodes"])
+        self.assertIsNone(Janggi.clone()._searcher)
+
+        # A Searcher passed in is used instead of a new one, so a second search finds the first in its table
+        searcher = Searcher(table_mb=1)
+        self.assertEqual(best_move(load_position("opening"), depth=2, searcher=searcher)["table"]["hits"], 0)
+        self.assertGreater(best_move(load_position("opening"), depth=2, searcher=searcher)["table"]["hits"], 0)
+
+    def test_quiescence(self):
+        """Capture-only move generation should find exactly the legal captures, and the search should play out the
+        captures at the end of a line rather than stop in the middle of an exchange"""
+        for name in ["opening", "middlegame", "check"]:
+            Janggi = load_position(name)
+            squares = Janggi.get_squares()
+            captures = [move for move in Janggi.legal_moves() if squares[move[1]] and move[0] != move[1]]
+            self.assertEqual(sorted(Janggi.legal_captures()), sorted(captures))
+
+        # The blue cannon on a6 jumps the soldier on e6 to take the chariot on i6, but can't jump the soldier on a5 to
+        # take the cannon on a3
+        Janggi = JanggiGame.from_position("9/4G4/9/9/C3s3r/s8/9/c8/4g4/9 b UNFINISHED")
+        self.assertEqual(list(Janggi.legal_captures()), [(to_square(5, 0), to_square(5, 8))])
+
+        # Taking the soldier on a5 with the chariot on a6 looks good to a depth 1 search, until the red chariot takes
+        # back
+        Janggi = JanggiGame.from_position("9/4G4/9/9/R8/s8/9/9/4g4/r8 b UNFINISHED")
+        result = best_move(Janggi, depth=1)
+        self.assertNotEqual(result["move"], (to_square(5, 0), to_square(4, 0)))
+        self.assertGreater(result["quiescence_nodes"], 0)
+        self.assertLess(result["quiescence_nodes"], result["nodes"])
+
+    def test_transposition_table(self):
+        """The transposition table should keep to its memory budget and prefer deeper searches in its first entries"""
+        table = TranspositionTable(1)
+        self.assertEqual(table.get_size(), 2 ** 20 // ENTRY_BYTES)
+        self.assertIsNone(table.probe(12345))
+        table.store(12345, 3, EXACT, -250, (66, 55))
+        self.assertEqual(table.probe(12345), (3, EXACT, -250, (66, 55)))
+
+        # Another position in the same bucket doesn't push out the deeper search, and takes the second entry
+        other_key = 12345 + table.get_size() // 2
+        table.store(other_key, 1, LOWER_BOUND, 40, None)
+        self.assertEqual(table.probe(12345), (3, EXACT, -250, (66, 55)))
+        self.assertEqual(table.probe(other_key), (1, LOWER_BOUND, 40, None))
+        table.store(other_key + table.get_size() // 2, 2, UPPER_BOUND, 0, None)
+        self.assertIsNone(table.probe(other_key)) # The second entry always takes the latest search
+        table.store(other_key, 5, EXACT, 10, (1, 2)) # A deeper search takes the first entry
+        self.assertEqual(table.probe(other_key), (5, EXACT, 10, (1, 2)))
+        self.assertIsNone(table.probe(12345))
+        stats = table.get_stats()
+        self.assertEqual((stats["probes"], stats["hits"], stats["stores"], stats["overwrites"]), (7, 4, 4, 2))
+
+        # Searching again with the same searcher finds the earlier search in the table
+        searcher = Searcher(table_mb=1)
+        first = searcher.best_move(load_position("opening"), depth=3)
+        again = searcher.best_move(load_position("opening"), depth=3)
+        self.assertEqual((again["move"], again["score"]), (first["move"], first["score"]))
+        self.assertLess(again["nodes"], first["nodes"])
+        self.assertGreater(again["table"]["hit_rate"], first["table"]["hit_rate"])
+
+    def test_move_ordering(self):
+        """Moves should be sorted with the table move first, then captures by MVV-LVA, then killers and history"""
+        Janggi = load_position("middlegame")
+        squares = Janggi.get_squares()
+        moves = list(Janggi.legal_moves())
+        captures = [(start, end) for start, end in moves if squares[end] and start != end]
+        quiet_moves = [move for move in moves if move not in captures]
+        self.assertGreater(len(captures), 1)
+
+        ordering = MoveOrdering(10)
+        ordered = ordering.order(squares, moves, 2, table_move=quiet_moves[-1])
+        self.assertEqual(ordered[0], quiet_moves[-1])
+        self.assertEqual(sorted(ordered[1:len(captures) + 1]), sorted(captures))
+        victims = [PIECE_VALUES[squares[end] & TYPE_MASK] for start, end in ordered[1:len(captures) + 1]]
+        self.assertEqual(victims, sorted(victims, reverse=True))
+
+        # A quiet move that cuts off the search becomes a killer and gains history, and a capture doesn't
+        killer = quiet_moves[3]
+        ordering.record_cutoff(squares, killer, 2, 3, 0)
+        ordering.record_cutoff(squares, captures[0], 2, 3, 5)
+        self.assertEqual(ordering.get_killers(2), (killer, None))
+        self.assertEqual(ordering.get_history(squares[killer[0]], killer[1]), 9)
+        self.assertEqual(ordering.order(squares, moves, 2)[len(captures)], killer)
+        self.assertEqual(ordering.get_stats(), {"cutoffs": 2, "first_move_cutoffs": 1, "first_move_cutoff_rate": 0.5})
+
+        result = Searcher().best_move(load_position("opening"), depth=3)
+        self.assertGreater(result["ordering"]["cutoffs"], 0)
+        self.assertGreater(result["ordering"]["first_move_cutoff_rate"], 0.5)
+
+    def test_evaluation(self):
+        """The evaluation kept up to date as moves are made should match one computed from scratch"""
+        Janggi = JanggiGame(verify_position_key=True)
+        self.assertEqual(Janggi.evaluate(), -15) # Only the deom, since the pieces are placed the same way
+        Janggi.make_move("c7", "c6")
+        self.assertEqual(Janggi.evaluate(), 14) # Blue's soldier gained a point, and it is Red's turn now
+        Janggi.make_move("c4", "c5")
+        Janggi.make_move("c6", "c5") # Blue soldier captures a red soldier
+        self.assertEqual(Janggi.evaluate(), -(20 + 2 + 1 - 15))
+        self.assertEqual(JanggiGame.from_position(Janggi.to_position()).evaluate(), Janggi.evaluate())
+        self.assertEqual(Janggi.clone().evaluate(), Janggi.evaluate())
+        Janggi.pop()
+        Janggi.pop()
+        Janggi.pop()
+        self.assertEqual(Janggi.evaluate(), -15)
+
+        Janggi = load_position("middlegame")
+        evaluation = Janggi.evaluate()
+        for move in Janggi.legal_moves():
+            Janggi.push(move)
+            self.assertEqual(-Janggi.evaluate(), compute_evaluation(Janggi.get_squares()))
+            Janggi.pop()
+        self.assertEqual(Janggi.evaluate(), evaluation)
+
+        # The self-check notices an evaluation that is out of step with the board
+        Janggi = JanggiGame(verify_position_key=True)
+        Janggi._evaluation += 1
+        self.assertRaises(RuntimeError, Janggi.position_key)
+
+    def test_perft(self):
+        """Counts of legal move sequences should match the reference counts"""
+        Janggi = load_position("start")
+        self.assertEqual(perft(Janggi, 1), 32)
+        self.assertEqual(perft(Janggi, 2), 1024)
+        self.assertEqual(Janggi.get_board(), JanggiGame().get_board()) # perft leaves the game as it found it
+        Janggi = load_position("check")
+        self.assertEqual(perft(Janggi, 2), 284)
+        self.assertEqual(sum(divide(Janggi, 2).values()), 284)
+        self.assertEqual(len(divide(Janggi, 1)), 7) # Red is in check, so it can't pass
+
+    def test_parallel_perft(self):
+        """Counting in worker processes should give the same counts as counting in one process"""
+        Janggi = load_position("check")
+        self.assertEqual(parallel_perft(Janggi, 3, workers=2), 9416)
+        self.assertEqual(parallel_divide(Janggi, 3, workers=2, split_plies=2), divide(Janggi, 3))
+
     def test_general_movement(self):
         """Fixed row numbers"""
         Janggi = JanggiGame()
@@ -124,6 +660,15 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(Janggi.make_move("b10","d7"), True) # Blue elephant successfully moves
         self.assertEqual(Janggi.make_move("b1","e3"), False) # Red elephant is blocked in this direction
         self.assertEqual(Janggi.make_move("b1","d4"), True) # Red elephant moves successfully
+        Janggi = JanggiGame()
+        self.assertEqual(Janggi.make_move("c10","d8"), True) # Move the blue horse out of the elephant's path
+        Janggi.make_move("e2", "e2")  # Red pass
+        self.assertEqual(Janggi.make_move("d10","d9"), True) # Blue guard moves onto the elephant's second blocking spot
+        Janggi.make_move("e2", "e2")  # Red pass
+        self.assertEqual(Janggi.make_move("b10","e8"), False) # Blue elephant is blocked by the guard
+        self.assertEqual(Janggi.make_move("d9","d10"), True) # Move the guard back
+        Janggi.make_move("e2", "e2")  # Red pass
+        self.assertEqual(Janggi.make_move("b10","e8"), True) # Blue elephant moves successfully
 
     def test_cannon_movement_1(self):
         """Fixed row numbers"""
@@ -169,6 +714,18 @@ class MyTestCase(unittest.TestCase):
         Janggi.make_move("e6", "d4")
         self.assertEqual(Janggi.is_in_check("Red"),True)
 
+    def test_square_attacked_by(self):
+        Janggi = JanggiGame()
+        self.assertEqual(Janggi.square_attacked_by(to_square(2, 0), "Red"), True) # Red chariot on a1
+        self.assertEqual(Janggi.square_attacked_by(to_square(5, 0), "Red"), False) # Red's own soldier blocks the chariot
+        self.assertEqual(Janggi.square_attacked_by(to_square(2, 3), "Red"), True) # Red horse on c1 and guard on d1
+        self.assertEqual(Janggi.square_attacked_by(to_square(4, 0), "Red"), True) # Red soldier on a4
+        self.assertEqual(Janggi.square_attacked_by(to_square(4, 1), "Red"), False)
+        Janggi.make_move("a7", "b7")
+        self.assertEqual(Janggi.square_attacked_by(to_square(4, 1), "Blue"), True) # Blue cannon jumps the soldier on b7
+        self.assertEqual(Janggi.square_attacked_by(to_square(2, 1), "Blue"), False) # Cannons can't capture cannons
+        self.assertEqual(Janggi.square_attacked_by(to_square(5, 1), "Red"), False) # Red cannon has nothing to jump
+
     def test_game_with_check(self):
         """These moves are made the Gradescope to test is_in_check functionality"""
         Janggi = JanggiGame()
@@ -1,51 +1,91 @@
-import pygame
-from constants import *
+from board import *
+
 
 class Piece():
     """A class that defines the general information about a piece, such as whose team it is on and where it is.
     Other piece classes will inherit from this and define piece specific details"""
 
-    def __init__(self, player):
-        """Initializes the piece with two data members: its location (initially empty) and its team."""
-        self._location = []
-        self._team = player
-        self._move_list = []
-        self._icon = ""
+    # Each piece class sets the piece type it is stored as on the compact board
+    _type = EMPTY
 
-        self._blue_palace_spaces = [[7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5]]
-        self._blue_palace_diags = [[7, 5], [8, 4], [9, 3], [7, 3], [8, 4], [9, 5]]
-        self._red_palace_spaces = [[0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5]]
-        self._red_palace_diags = [[2, 3], [1, 4], [0, 5], [0, 3], [1, 4], [2, 5]]
+    # Many games can be held in memory at once, so pieces keep only these fields, with no __dict__. Everything that is
+    # the same for every piece of a kind, such as where it can move from each square, is in the shared tables in
+    # board.py, and piece classes add no fields of their own.
+    __slots__ = ("_square", "_team", "_moves", "_move_mask", "_watched_squares", "_team_bit", "_enemy", "_code")
 
-    def calc_pixel_position(self,index):
-        """Receives an integer representing either the row or column index whose pixel center postion needs to be determined.
-        Returns the pixel position where an icon must be drawing for it to appear centered in the square. Subtracts 20 from
-        the square center, which is half the size of the current icon size, to yield the correct biased location."""
+    def __init__(self, player):
+        """Initializes the piece with two data members: its location (initially off the board) and its team."""
+        self._square = None
+        self._team = player
 
-        return (SQUARE_SIZE * index + (SQUARE_SIZE // 2)) - half_icon
+        # The squares the piece can move to (see board.py), and the same squares as a bitmask so the game can tell if
+        # the piece can move to a square without searching the list
+        self._moves = []
+        self._move_mask = 0
 
-    def draw(self,window):
-        pos = self.get_location()
-        row = pos[0]
-        col = pos[1]
+        # A bitmask of the squares the move list was built from (see board.squares_mask). The game only recomputes the
+        # move list when one of these squares changes.
+        self._watched_squares = 0
 
-        window.blit(self._icon,(self.calc_pixel_position(col),self.calc_pixel_position(row)))
+        # The piece code stored on the compact board, and the team bits used to tell friend from foe when reading it
+        self._team_bit = TEAM_BITS[player]
+        self._enemy = TEAM_MASK ^ self._team_bit
+        self._code = self._team_bit | self._type
 
     def get_location(self):
-        """Returns the current location of the piece"""
-        return self._location
+        """Returns the current location of the piece as a list [row, col]"""
+        return square_to_location(self._square)
 
     def set_location(self, new_pos):
         """Sets a new location for the piece as a list [row, col]"""
-        self._location = new_pos
+        self._square = to_square(new_pos[0], new_pos[1])
+
+    def get_square(self):
+        """Returns the square the piece is on, as an index into the compact board"""
+        return self._square
+
+    def set_square(self, square):
+        """Sets the square the piece is on, as an index into the compact board"""
+        self._square = square
 
     def get_team(self):
         """Returns the team the piece is on"""
         return self._team
 
+    def get_code(self):
+        """Returns the code used for the piece on the compact board"""
+        return self._code
+
     def get_move_list(self):
-        """Returns the move list for the piece"""
-        return self._move_list
+        """Returns the move list for the piece, as a list of [row, col] locations"""
+        return [square_to_location(square) for square in self._moves]
+
+    def get_moves(self):
+        """Returns the list of squares the piece can move to"""
+        return self._moves
+
+    def can_move_to(self, square):
+        """Returns True if the piece can move to the given square, and False otherwise"""
+        return self._move_mask >> square & 1 == 1
+
+    def get_watched_squares(self):
+        """Returns the bitmask of squares the move list depends on"""
+        return self._watched_squares
+
+    def clone(self):
+        """Returns a copy of the piece for a cloned game. The move list is shared rather than copied, which is safe
+        because it is always replaced with a new list, never changed in place."""
+
+        piece = object.__new__(self.__class__)
+        piece._square = self._square
+        piece._team = self._team
+        piece._moves = self._moves
+        piece._move_mask = self._move_mask
+        piece._watched_squares = self._watched_squares
+        piece._team_bit = self._team_bit
+        piece._enemy = self._enemy
+        piece._code = self._code
+        return piece
 
     def off_the_board(self, pos):
         """Returns True if the given position is off the board, and False otherwise"""
@@ -63,134 +103,83 @@ class General(Piece):
     start position. Decisions on checking a General piece will be made based on the piece ID, not its class.
     The JanggiGame class will also update the piece's location on the board. The piece knows what all its valid moves are from its current position."""
 
-    def __init__(self, player):
-        """Initializes the piece and sets it to belong to a certain player. Initializes the list of viable moves for the piece"""
-        super().__init__(player)
-
-        # This data member is a list containing tuples that represent coordinate pairs. These pairs describe how this piece can move on the board, relative to its current position.
-        # The General piece can move one space in any direction in the palace.
-        self._diag_movement = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
-        self._normal_movement = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-
-        if player == "Blue":
-            self._opponent = "Red"
-            self._icon = blue_gen
-        else:
-            self._opponent = "Blue"
-            self._icon = red_gen
+    _type = GENERAL
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
         Based on its current location, the piece will check all available positions it could move to to see if they're valid.
         If it is, it adds it to the valid_moves list"""
 
-        self._move_list = []
-
-        current_pos = self.get_location()
-
-        if self.get_team() == "Blue":
-            if current_pos in self._blue_palace_diags:
-                self._movement = self._diag_movement
-            else:
-                self._movement = self._normal_movement
-        else:
-            if current_pos in self._red_palace_diags:
-                self._movement = self._diag_movement
-            else:
-                self._movement = self._normal_movement
-
-        for move in self._movement:
-
-            new_pos = [int(current_pos[0]) + move[0], int(current_pos[1]) + move[1]]
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
 
-            # Blue general logic
-            if self.get_team() == "Blue" and new_pos in self._blue_palace_spaces:
-                if (game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower()) and self.space_is_safe(game,new_pos):
-                    self._move_list.append(new_pos)
+        # Whether a space is safe can depend on any square on the board, so the General watches no squares and the
+        # game recomputes it after every move instead
 
-            # Red general logic
-            if self.get_team() == "Red" and new_pos in self._red_palace_spaces:
-                if (game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower()) and self.space_is_safe(game,new_pos):
-                    self._move_list.append(new_pos)
+        # The General piece can move one space along the lines of its own palace
+        for square in PALACE_MOVES[self._team_bit][self._square]:
+            if not squares[square] & self._team_bit:
+                if self.space_is_safe(game, square):
+                    moves.append(square)
+                    move_mask |= 1 << square
 
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
 
-        return self._move_list
+    def space_is_safe(self, game, new_square):
+        """Receives an object of the game and a square on the compact board.
+        Returns true if the square is safe for the general to move into, and False if it is not. The move is tried on
+        the board, so a piece the general would capture no longer counts and the square the general leaves is empty."""
 
-    def space_is_safe(self, game, new_pos):
-        """Receives an object of the game and a new position ( a list containing a row and column).
-        Returns true if the new_pos is safe for the general to move into, and False if it is not."""
+        return not game.move_causes_check(self._square, new_square, self)
 
-        if self.get_team() == "Blue":
-            opponent_dict = game.get_piece_dictionary("Red")
-        else:
-            opponent_dict = game.get_piece_dictionary("Blue")
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether the general would be safe on the square
+        isn't checked here."""
 
-        space_is_safe = True
-
-        for piece_id in opponent_dict:
-            piece = game.get_piece_from_id(piece_id)
-            move_list = piece.get_move_list()
-            if new_pos in move_list:
-                space_is_safe = False
-
-        return space_is_safe
+        squares = game.get_squares()
+        return [square for square in PALACE_MOVES[self._team_bit][self._square] if squares[square] & self._enemy]
 
 
 class Guard(Piece):
     """Represents the Guard piece. Communicates with the Piece class to inherit from it, and is created by the JanggiGame class.
     Decisions on checking a General piece will be made based on the piece ID, not its class. The JanggiGame class will also update the piece's location on the board. The piece knows what all its valid moves are from its current position."""
 
-    def __init__(self, player):
-        """Initializes the piece and sets it to belong to a certain player. Initializes the list of viable moves for the piece"""
-        super().__init__(player)
-
-        # This data member is a list containing tuples that represent coordinate pairs. These pairs describe how this piece can move on the board, relative to its current position.
-        # The guard piece can move one space in any direction in the palace.
-        self._diag_movement = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
-        self._normal_movement = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-
-        if player == "Blue":
-            self._opponent = "Red"
-            self._icon = blue_adv
-        else:
-            self._opponent = "Blue"
-            self._icon = red_adv
+    _type = GUARD
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
                 Based on its current location, the piece will check all available positions it could move to to see if they're valid.
                 If it is, it adds it to the valid_moves list"""
 
-        self._move_list = []
-
-        current_pos = self.get_location()
-
-        if self.get_team() == "Blue":
-            if current_pos in self._blue_palace_diags:
-                self._movement = self._diag_movement
-            else:
-                self._movement = self._normal_movement
-        else:
-            if current_pos in self._red_palace_diags:
-                self._movement = self._diag_movement
-            else:
-                self._movement = self._normal_movement
-
-        for move in self._movement:
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
 
-            new_pos = [int(current_pos[0]) + move[0], int(current_pos[1]) + move[1]]
+        # The guard piece can move one space along the lines of its own palace
+        current_square = self._square
+        self._watched_squares = PALACE_MASKS[self._team_bit][current_square]
+        for square in PALACE_MOVES[self._team_bit][current_square]:
+            if not squares[square] & self._team_bit:
+                moves.append(square)
+                move_mask |= 1 << square
 
-            # Blue general logic
-            if self.get_team() == "Blue" and new_pos in self._blue_palace_spaces:
-                if (game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower()):
-                    self._move_list.append(new_pos)
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
 
-            # Red general logic
-            if self.get_team() == "Red" and new_pos in self._red_palace_spaces:
-                if (game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower()):
-                    self._move_list.append(new_pos)
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
 
-        return self._move_list
+        squares = game.get_squares()
+        return [square for square in PALACE_MOVES[self._team_bit][self._square] if squares[square] & self._enemy]
 
 
 class Soldier(Piece):
@@ -198,52 +187,38 @@ class Soldier(Piece):
     The JanggiGame class will also update the piece's location on the board. The piece knows what all its valid moves are from its current
     position."""
 
-    def __init__(self, player):
-        """Initializes the piece and sets it to belong to a certain player. Initializes the list of viable moves for the piece"""
-        super().__init__(player)
-
-        # This data member is a list containing tuples that represent coordinate pairs. These pairs describe how this piece can move on the board, relative to its current position.
-        # The Solder piece can move one space forward or one piece to the left or right if it is not in the palace. Inside the palace, it can also move forward diagonally.
-        # Depending on which team the piece is on, "forward" movement in the tuples below will be reversed
-        self._movement = []
-        if player == "Blue":
-            self._regular_movement = [(-1, 0), (0, 1), (0, -1)]
-            self._palace_movement = [(-1, 0), (0, 1), (0, -1), (-1, 1), (-1, -1)]
-            self._opponent = "Red"
-            self._icon = blue_sol
-        else:
-            self._regular_movement = [(1, 0), (0, 1), (0, -1)]
-            self._palace_movement = [(1, 0), (0, 1), (0, -1), (1, 1), (1, -1)]
-            self._opponent = "Blue"
-            self._icon = red_sol
+    _type = SOLDIER
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
                 Based on its current location, the piece will check all available positions it could move to to see if they're valid.
                 If it is, it adds it to the valid_moves list"""
-        # Need to move diagonally in the palace but not if you're on the edge and you're trying to move away from it.
-
-        self._move_list = []
-
-        if self.get_location() in self._blue_palace_diags or self.get_location() in self._red_palace_diags:
-            self._movement = self._palace_movement
-        else:
-            self._movement = self._regular_movement
-
-        for move in self._movement:
-            current_pos = self.get_location()
-            new_pos = [int(current_pos[0]) + move[0], int(current_pos[1]) + move[1]]
-            if not self.off_the_board(new_pos):
-                if current_pos not in self._blue_palace_spaces and current_pos not in self._red_palace_spaces:
-                    if game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower():
-                        self._move_list.append(new_pos)
-                else:
-                    if new_pos[1] >= 3 or new_pos[1] <= 5:
-                        if game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[
-                            0].lower():
-                            self._move_list.append(new_pos)
 
-        return self._move_list
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
+
+        # The Soldier piece can move one space forward or one space to the left or right. Inside the palace, it can also
+        # move forward along the diagonal lines, but never diagonally out of the palace.
+        current_square = self._square
+        self._watched_squares = SOLDIER_MASKS[self._team_bit][current_square]
+        for square in SOLDIER_MOVES[self._team_bit][current_square]:
+            if not squares[square] & self._team_bit:
+                moves.append(square)
+                move_mask |= 1 << square
+
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
+
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
+
+        squares = game.get_squares()
+        return [square for square in SOLDIER_MOVES[self._team_bit][self._square] if squares[square] & self._enemy]
 
 
 class Chariot(Piece):
@@ -251,470 +226,135 @@ class Chariot(Piece):
     The JanggiGame class will also update the piece's location on the board.The piece knows what all its valid moves are from its current
     position."""
 
-    def __init__(self, player):
-        super().__init__(player)
-
-        if player == "Blue":
-            self._opponent = "Red"
-            self._icon = blue_char
-        else:
-            self._opponent = "Blue"
-            self._icon = red_char
+    _type = CHARIOT
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
                 Based on its current location, the piece will check all available positions it could move to to see if they're valid.
                 If it is, it adds it to the valid_moves list"""
-        current_pos = self.get_location()
-
-        self._move_list = []
-
-        current_pos = self.get_location()
-        row = current_pos[0]
-        col = current_pos[1]
-
-        # Check to the north
-        next_pos = [row-1,col]
-        saw_a_piece = False
-        while (not self.off_the_board(next_pos)) and (saw_a_piece is False):
-            if game.whats_here(next_pos) == "___":
-                #add the space and keep going
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                saw_a_piece = True
-                # add the space and keep going through another cycle
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                # add the space but don't count it and keep going
-                self._move_list.append(next_pos)
-            else: # count the piece and increment and stop next round
-                saw_a_piece = True
-            next_row = next_pos[0] - 1
-            next_pos = [next_row, col]
-
-
-        # Check to the south
-        next_pos = [row + 1, col]
-        saw_a_piece = False
-        while (not self.off_the_board(next_pos)) and (saw_a_piece is False):
-            if game.whats_here(next_pos) == "___":
-                # add the space and keep going
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                saw_a_piece = True
-                # add the space and keep going through another cycle
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                # add the space but don't count it and keep going
-                self._move_list.append(next_pos)
-            else:  # count the piece and increment and stop next round
-                saw_a_piece = True
-            next_row = next_pos[0] + 1
-            next_pos = [next_row, col]
-
-        # Check to the east
-        next_pos = [row, col+1]
-        saw_a_piece = False
-        while (not self.off_the_board(next_pos)) and (saw_a_piece is False):
-            if game.whats_here(next_pos) == "___":
-                # add the space and keep going
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                saw_a_piece = True
-                # add the space and keep going through another cycle
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                # add the space but don't count it and keep going
-                self._move_list.append(next_pos)
-            else:  # count the piece and increment and stop next round
-                saw_a_piece = True
-            next_col = next_pos[1] + 1
-            next_pos = [row, next_col]
-
-        # Check to the west
-        next_pos = [row, col - 1]
-        saw_a_piece = False
-        while (not self.off_the_board(next_pos)) and (saw_a_piece is False):
-            if game.whats_here(next_pos) == "___":
-                # add the space and keep going
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                saw_a_piece = True
-                # add the space and keep going through another cycle
-                self._move_list.append(next_pos)
-            elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                # add the space but don't count it and keep going
-                self._move_list.append(next_pos)
-            else:  # count the piece and increment and stop next round
-                saw_a_piece = True
-            next_col = next_pos[1] - 1
-            next_pos = [row, next_col]
-
-        if current_pos in self._blue_palace_diags or current_pos in self._red_palace_diags:
-
-            # CHeck to the southeast
-            next_pos = [row + 1, col + 1]
-            saw_a_piece = False
-            while (next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (saw_a_piece is False):
-                if game.whats_here(next_pos) == "___":
-                    # add the space and keep going
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    saw_a_piece = True
-                    # add the space and keep going through another cycle
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    # add the space but don't count it and keep going
-                    self._move_list.append(next_pos)
-                else:  # count the piece and increment and stop next round
-                    saw_a_piece = True
-                next_row = next_pos[0] + 1
-                next_col = next_pos[1] + 1
-                next_pos = [next_row, next_col]
-
-            #Check to the northeast
-            next_pos = [row - 1, col + 1]
-            saw_a_piece = False
-            while (next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (
-                    saw_a_piece is False):
-                if game.whats_here(next_pos) == "___":
-                    # add the space and keep going
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    saw_a_piece = True
-                    # add the space and keep going through another cycle
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    # add the space but don't count it and keep going
-                    self._move_list.append(next_pos)
-                else:  # count the piece and increment and stop next round
-                    saw_a_piece = True
-                next_row = next_pos[0] - 1
-                next_col = next_pos[1] + 1
-                next_pos = [next_row, next_col]
-
-            # Check to the northwest
-            next_pos = [row - 1, col - 1]
-            saw_a_piece = False
-            while (next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (
-                    saw_a_piece is False):
-                if game.whats_here(next_pos) == "___":
-                    # add the space and keep going
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    saw_a_piece = True
-                    # add the space and keep going through another cycle
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    # add the space but don't count it and keep going
-                    self._move_list.append(next_pos)
-                else:  # count the piece and increment and stop next round
-                    saw_a_piece = True
-                next_row = next_pos[0] - 1
-                next_col = next_pos[1] - 1
-                next_pos = [next_row, next_col]
-
-            # Check to the southeast
-            next_pos = [row + 1, col - 1]
-            saw_a_piece = False
-            while (next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (
-                    saw_a_piece is False):
-                if game.whats_here(next_pos) == "___":
+
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
+
+        # Check to the north, south, east and west, and along the palace diagonals if the chariot is on one
+        current_square = self._square
+        path_masks = PATH_MASKS[current_square]
+        watched_squares = 0
+        for ray in RAYS[current_square]:
+            for square in ray:
+                code = squares[square]
+                if code == EMPTY:
                     # add the space and keep going
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] != '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    saw_a_piece = True
-                    # add the space and keep going through another cycle
-                    self._move_list.append(next_pos)
-                elif game.whats_here(next_pos)[1] == '@' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                    # add the space but don't count it and keep going
-                    self._move_list.append(next_pos)
-                else:  # count the piece and increment and stop next round
-                    saw_a_piece = True
-                next_row = next_pos[0] + 1
-                next_col = next_pos[1] - 1
-                next_pos = [next_row, next_col]
-
-        return self._move_list
+                    moves.append(square)
+                    move_mask |= 1 << square
+                else:
+                    # add the space if the piece can be captured, and stop
+                    if code & self._enemy:
+                        moves.append(square)
+                        move_mask |= 1 << square
+                    break
+            # The move list depends on every square up to the one where the chariot stopped
+            watched_squares |= path_masks[square]
+
+        self._watched_squares = watched_squares
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
+
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
+
+        captures = []
+        squares = game.get_squares()
+
+        # Only the first piece along each line can be captured
+        for ray in RAYS[self._square]:
+            for square in ray:
+                code = squares[square]
+                if code != EMPTY:
+                    if code & self._enemy:
+                        captures.append(square)
+                    break
+        return captures
 
 class Cannon(Piece):
     """Represents the Cannon pieces. Communicates with the Piece class to inherit from it, and communicates the JanggiGame to check the board for whether a move is valid.
     The JanggiGame class will update the piece's location if it is moved. The piece knows where it is, and what moves it is allowed to make, including if it is blocked from
     an otherwise valid move by another piece on the board."""
 
-    def __init__(self, player):
-        """Initializes the piece to belong to a certain team"""
-        super().__init__(player)
-
-        # _piece_count is used to detect if there is exactly one piece between the cannon and its target
-        self._piece_count = 0
-
-        if player == "Blue":
-            self._opponent = "Red"
-            self._icon = blue_can
-        else:
-            self._opponent = "Blue"
-            self._icon = red_can
+    _type = CANNON
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
         Based on its current location, the piece will check all available positions it could move to to see if they're valid.
         If it is, it adds it to the valid_moves list"""
 
-        self._move_list = []
-
-
-        current_pos = self.get_location()
-        row = current_pos[0]
-        col = current_pos[1]
-
-        # Check to the north
-        next_pos = [row - 1, col]
-        piece_count = 0
-        saw_a_cannon = False
-        while piece_count < 2 and (saw_a_cannon is False) and (not self.off_the_board(next_pos)):
-            if piece_count == 1:
-                if game.whats_here(next_pos) == "___":
-                    self._move_list.append(next_pos)
-                else:
-                    if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[0].lower():
-                        self._move_list.append(next_pos)
-                        piece_count += 1
-                    if game.whats_here(next_pos)[1] == '#':
-                        saw_a_cannon = True
-                    if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                        piece_count += 1
-                next_row = next_pos[0] - 1
-                next_pos = [next_row, col]
-            elif game.whats_here(next_pos)[1] == '#':
-                saw_a_cannon = True
-            elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                piece_count += 1
-                next_row = next_pos[0] - 1
-                next_pos = [next_row, col]
-            else:
-                if piece_count == 0:
-                    next_row = next_pos[0] - 1
-                    next_pos = [next_row, col]
-
-        # Check to the south
-        next_pos = [row + 1, col]
-        piece_count = 0
-        saw_a_cannon = False
-        while ((not self.off_the_board(next_pos)) and (piece_count < 2) and (saw_a_cannon is False)):
-            if piece_count == 1:
-                if game.whats_here(next_pos) == "___":
-                    self._move_list.append(next_pos)
-                else:
-                    if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                        0].lower():
-                        self._move_list.append(next_pos)
-                        piece_count += 1
-                    if game.whats_here(next_pos)[1] == '#':
-                        saw_a_cannon = True
-                    if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                        piece_count += 1
-                next_row = next_pos[0] + 1
-                next_pos = [next_row, col]
-            elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                piece_count += 1
-                next_row = next_pos[0] + 1
-                next_pos = [next_row, col]
-            elif game.whats_here(next_pos)[1] == '#':
-                saw_a_cannon = True
-            else:
-                next_row = next_pos[0] + 1
-                next_pos = [next_row, col]
-
-        # Check to the east
-        next_pos = [row, col + 1]
-        piece_count = 0
-        saw_a_cannon = False
-        while (not self.off_the_board(next_pos)) and (piece_count < 2) and (saw_a_cannon is False):
-            if piece_count == 1:
-                if game.whats_here(next_pos) == "___":
-                    self._move_list.append(next_pos)
-                else:
-                    if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                        0].lower():
-                        self._move_list.append(next_pos)
-                        piece_count += 1
-                    if game.whats_here(next_pos)[1] == '#':
-                        saw_a_cannon = True
-                    if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                        piece_count += 1
-                next_col = next_pos[1] + 1
-                next_pos = [row, next_col]
-            elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                piece_count += 1
-                next_col = next_pos[1] + 1
-                next_pos = [row, next_col]
-            elif game.whats_here(next_pos)[1] == '#':
-                saw_a_cannon = True
-            else:
-                next_col = next_pos[1] + 1
-                next_pos = [row, next_col]
-
-        # Check to the west
-        next_pos = [row, col - 1]
-        piece_count = 0
-        saw_a_cannon = False
-        while (not self.off_the_board(next_pos)) and (piece_count < 2) and (saw_a_cannon is False):
-            if piece_count == 1:
-                if game.whats_here(next_pos) == "___":
-                    self._move_list.append(next_pos)
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
+
+        # Check to the north, south, east and west, and along the palace diagonals if the cannon is on one
+        current_square = self._square
+        path_masks = PATH_MASKS[current_square]
+        watched_squares = 0
+        for ray in RAYS[current_square]:
+            jumped = False
+            for square in ray:
+                code = squares[square]
+                if not jumped:
+                    if code & TYPE_MASK == CANNON:
+                        # Cannons can't jump over other cannons
+                        break
+                    if code != EMPTY:
+                        jumped = True
+                elif code == EMPTY:
+                    # Past the piece being jumped, every empty space is valid
+                    moves.append(square)
+                    move_mask |= 1 << square
                 else:
-                    if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                        0].lower():
-                        self._move_list.append(next_pos)
-                        piece_count += 1
-                    if game.whats_here(next_pos)[1] == '#':
-                        saw_a_cannon = True
-                    if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                        piece_count += 1
-                next_col = next_pos[1] - 1
-                next_pos = [row, next_col]
-            elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                piece_count += 1
-                next_col = next_pos[1] - 1
-                next_pos = [row, next_col]
-            elif game.whats_here(next_pos)[1] == '#':
-                saw_a_cannon = True
-            else:
-                next_col = next_pos[1] - 1
-                next_pos = [row, next_col]
-
-        if current_pos in self._blue_palace_diags or current_pos in self._red_palace_diags:
-
-            # CHeck to the southeast
-            next_pos = [row + 1, col + 1]
-            piece_count = 0
-            saw_a_cannon = False
-            while ((not self.off_the_board(next_pos)) and next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (piece_count < 2) and (saw_a_cannon is False):
-                if piece_count == 1:
-                    if game.whats_here(next_pos) == "___":
-                        self._move_list.append(next_pos)
-                    else:
-                        if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                            0].lower():
-                            self._move_list.append(next_pos)
-                            piece_count += 1
-                        if game.whats_here(next_pos)[1] == '#':
-                            saw_a_cannon = True
-                        if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                            piece_count += 1
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                    piece_count += 1
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos)[1] == '#':
-                    saw_a_cannon = True
+                    # The first piece past the jump can be captured if it is an opponent, but not if it is a cannon
+                    if code & self._enemy and code & TYPE_MASK != CANNON:
+                        moves.append(square)
+                        move_mask |= 1 << square
+                    break
+            # The move list depends on every square up to the one where the cannon stopped, including its screen
+            watched_squares |= path_masks[square]
+
+        self._watched_squares = watched_squares
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
+
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
+
+        captures = []
+        squares = game.get_squares()
+
+        # Only the first piece past the screen along each line can be captured. Neither the screen nor the piece
+        # captured can be a cannon.
+        for ray in RAYS[self._square]:
+            jumped = False
+            for square in ray:
+                code = squares[square]
+                if code == EMPTY:
+                    continue
+                if not jumped:
+                    if code & TYPE_MASK == CANNON:
+                        break
+                    jumped = True
                 else:
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-
-            # Check to the southeast
-            next_pos = [row + 1, col - 1]
-            piece_count = 0
-            saw_a_cannon = False
-            while ((not self.off_the_board(next_pos)) and next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (piece_count < 2) and (saw_a_cannon is False):
-                if piece_count == 1:
-                    if game.whats_here(next_pos) == "___":
-                        self._move_list.append(next_pos)
-                    else:
-                        if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                            0].lower():
-                            self._move_list.append(next_pos)
-                            piece_count += 1
-                        if game.whats_here(next_pos)[1] == '#':
-                            saw_a_cannon = True
-                        if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                            piece_count += 1
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                    piece_count += 1
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos)[1] == '#':
-                    saw_a_cannon = True
-                else:
-                    next_row = next_pos[0] + 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-
-            # Check to the northwest
-            next_pos = [row - 1, col - 1]
-            piece_count = 0
-            saw_a_cannon = False
-            while ((not self.off_the_board(next_pos)) and next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (piece_count < 2) and (saw_a_cannon is False):
-                if piece_count == 1:
-                    if game.whats_here(next_pos) == "___":
-                        self._move_list.append(next_pos)
-                    else:
-                        if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                            0].lower():
-                            self._move_list.append(next_pos)
-                            piece_count += 1
-                        if game.whats_here(next_pos)[1] == '#':
-                            saw_a_cannon = True
-                        if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                            piece_count += 1
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                    piece_count += 1
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos)[1] == '#':
-                    saw_a_cannon = True
-                else:
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] - 1
-                    next_pos = [next_row, next_col]
-
-            # Check to the northeast
-            next_pos = [row - 1, col + 1]
-            piece_count = 0
-            saw_a_cannon = False
-            while ((not self.off_the_board(next_pos)) and next_pos in self._blue_palace_diags or next_pos in self._red_palace_diags) and (piece_count < 2) and (saw_a_cannon is False):
-                if piece_count == 1:
-                    if game.whats_here(next_pos) == "___":
-                        self._move_list.append(next_pos)
-                    else:
-                        if game.whats_here(next_pos)[1] != '#' and game.whats_here(next_pos)[0] == self._opponent[
-                            0].lower():
-                            self._move_list.append(next_pos)
-                            piece_count += 1
-                        if game.whats_here(next_pos)[1] == '#':
-                            saw_a_cannon = True
-                        if game.whats_here(next_pos)[0] != self._opponent[0].lower():
-                            piece_count += 1
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos) != "___" and game.whats_here(next_pos)[1] != '#':
-                    piece_count += 1
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-                elif game.whats_here(next_pos)[1] == '#':
-                    saw_a_cannon = True
-                else:
-                    next_row = next_pos[0] - 1
-                    next_col = next_pos[1] + 1
-                    next_pos = [next_row, next_col]
-
-        return self._move_list
+                    if code & self._enemy and code & TYPE_MASK != CANNON:
+                        captures.append(square)
+                    break
+        return captures
 
 
 class Horse(Piece):
@@ -722,59 +362,77 @@ class Horse(Piece):
     The JanggiGame class will also update the piece's location on the board.The piece knows what all its valid moves are from its current
     position."""
 
-    def __init__(self, player):
-        """Initializes the piece and sets it to belong to a certain player. Initializes the list of viable moves for the piece"""
-        super().__init__(player)
-
-        self._movement = [(-2, 1), (-2, -1), (2, 1), (2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        self._block_direction = [(-1, 0), (-1, 0), (1, 0), (1, 0), (0, 1), (0, -1), (0, 1), (0, -1)]
-        self._blocking_spots = []
-
-        if player == "Blue":
-            self._opponent = "Red"
-            self._icon = blue_horse
-        else:
-            self._opponent = "Blue"
-            self._icon = red_horse
+    _type = HORSE
+    __slots__ = ()
 
     def check_for_moves(self, game):
         """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
                 Based on its current location, the piece will check all available positions it could move to to see if they're valid.
                 If it is, it adds it to the valid_moves list"""
 
-        current_pos = self.get_location()
-        self._move_list = []
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
 
-        for index in range(len(self._movement)):
-            # Get the target position
-            new_pos = [int(current_pos[0]) + self._movement[index][0], int(current_pos[1]) + self._movement[index][1]]
+        current_square = self._square
+        self._watched_squares = HORSE_MASKS[current_square]
+        for new_square, blocking_square in HORSE_MOVES[current_square]:
+            # If the blocking spot is free and the end position is either free or has an opponent there, add it to the list
+            if squares[blocking_square] == EMPTY and not squares[new_square] & self._team_bit:
+                moves.append(new_square)
+                move_mask |= 1 << new_square
 
-            # If the new position is on the board
-            if (new_pos[0] >= 0 and new_pos[0] <= 9) and (new_pos[1] >= 0 and new_pos[1] <= 8):
-                # Get the blocking spot and check if its blocked
-                blocking_spot = [int(current_pos[0]) + self._block_direction[index][0],
-                                 int(current_pos[1]) + self._block_direction[index][1]]
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
 
-                # If the blocking spot is free and the end position is either free or has an opponent there, add it to the list
-                if game.whats_here(blocking_spot) == "___" and (
-                        game.whats_here(new_pos) == "___" or game.whats_here(new_pos)[0] == self._opponent[0].lower()):
-                    self._move_list.append(new_pos)
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
 
-        return self._move_list
+        squares = game.get_squares()
+        return [new_square for new_square, blocking_square in HORSE_MOVES[self._square]
+                if squares[new_square] & self._enemy and squares[blocking_square] == EMPTY]
 
 
 class Elephant(Horse):
-    """Represents the Elephant pieces, and inherits from the Horse class, as they have very similar movement and the same
-    move checking logic. Communicates with the Piece class to inherit from it, and is created by the JanggiGame class.
+    """Represents the Elephant pieces, and inherits from the Horse class, as they have very similar movement. The
+    elephant moves one space further diagonally, so it has two blocking spots instead of one. Communicates with the Piece class to inherit from it, and is created by the JanggiGame class.
     The JanggiGame class will also update the piece's location on the board.The piece knows what all its valid moves are from its current
     position."""
 
-    def __init__(self, player):
-        """Initializes the piece and sets it to belong to a certain player. Initializes the list of viable moves for the piece"""
-        super().__init__(player)
-        if player == "Blue":
-            self._icon = blue_el
-        else:
-            self._icon = red_el
-
-        self._movement = [(-3, 2), (-3, -2), (3, 2), (3, -2), (2, 3), (2, -3), (-2, 3), (-2, -3)]
\ No newline at end of file
+    _type = ELEPHANT
+    __slots__ = ()
+
+    def check_for_moves(self, game):
+        """Receives the game object that is playing with this piece as a parameter, to allow it to check for valid moves.
+                Based on its current location, the piece will check all available positions it could move to to see if they're valid.
+                If it is, it adds it to the valid_moves list"""
+
+        moves = []
+        move_mask = 0
+        squares = game.get_squares()
+
+        current_square = self._square
+        self._watched_squares = ELEPHANT_MASKS[current_square]
+        for new_square, first_blocking_square, second_blocking_square in ELEPHANT_MOVES[current_square]:
+            # Both blocking spots must be free, and the end position either free or have an opponent there
+            if squares[first_blocking_square] == EMPTY and squares[second_blocking_square] == EMPTY and (
+                    not squares[new_square] & self._team_bit):
+                moves.append(new_square)
+                move_mask |= 1 << new_square
+
+        self._moves = moves
+        self._move_mask = move_mask
+        return moves
+
+    def generate_captures(self, game):
+        """Receives the game object that is playing with this piece, and returns the squares of the opponent's pieces
+        this piece could capture, without building the whole move list. Whether a capture would leave the player's
+        general in check isn't checked here."""
+
+        squares = game.get_squares()
+        return [new_square for new_square, first_blocking_square, second_blocking_square in ELEPHANT_MOVES[self._square]
+                if squares[new_square] & self._enemy and squares[first_blocking_square] == EMPTY and
+                squares[second_blocking_square] == EMPTY]
\ No newline at end of file
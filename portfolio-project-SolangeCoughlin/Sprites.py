@@ -0,0 +1,42 @@
+"""
+Binds the piece images to the rules engine's Piece objects for the Janggi GUI. The rules engine (JanggiGame.py and
+Piece.py) does not know about pygame, so each image is loaded and scaled here the first time a piece of that type and
+team is drawn, and reused after that.
+"""
+
+import pygame
+from constants import *
+
+_icon_cache = {}
+
+
+def get_icon(piece):
+    """
+    Receives a piece object and returns the scaled image used to draw it. Loads the image from the assets folder the
+    first time it is requested
+    """
+    key = (piece.get_team(), type(piece).__name__)
+    icon = _icon_cache.get(key)
+    if icon is None:
+        file_name = 'assets/' + key[0].lower() + '_' + PIECE_IMAGE_NAMES[key[1]] + '.png'
+        icon = pygame.image.load(file_name)
+        icon = pygame.transform.scale(icon, (scale_size, scale_size))
+        _icon_cache[key] = icon
+    return icon
+
+
+def calc_pixel_position(index):
+    """
+    Receives an integer representing either the row or column index whose pixel center postion needs to be determined.
+    Returns the pixel position where an icon must be drawing for it to appear centered in the square. Subtracts half the
+    size of the current icon size from the square center to yield the correct biased location.
+    """
+    return (SQUARE_SIZE * index + (SQUARE_SIZE // 2)) - half_icon
+
+
+def draw_piece(window, piece):
+    """
+    Draws a piece onto the window at its current location on the board
+    """
+    row, col = piece.get_location()
+    window.blit(get_icon(piece), (calc_pixel_position(col), calc_pixel_position(row)))
@@ -0,0 +1,308 @@
+"""
+A compact binary archive format for finished Janggi games, with a writer, a streaming reader and a converter from the
+text records written by recorder.FileRecorder (and the older move_list.txt files).
+
+Layout, all numbers little-endian:
+
+    file header     4 bytes  magic b"JNGA"
+                    2 bytes  format version (1)
+                    2 bytes  reserved, 0
+                    4 bytes  number of games
+    each game       2 bytes  length of the metadata in bytes
+                    n bytes  metadata, a UTF-8 JSON object, always with a "game_id"
+                    1 byte   result: 0 UNFINISHED, 1 BLUE_WON, 2 RED_WON
+                    4 bytes  number of moves
+                    2 bytes  per move: start square * 90 + end square (see board.py), a pass having the same start and
+                             end square
+
+Run it from the command line with:
+    python archive.py convert move_list.txt games.jga
+    python archive.py list games.jga
+"""
+
+import argparse
+import json
+import mmap
+import struct
+from board import *
+from JanggiGame import JanggiGame
+
+MAGIC = b"JNGA"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHHI")
+GAME_HEADER = struct.Struct("<H")
+GAME_TRAILER = struct.Struct("<BI")
+RESULTS = ["UNFINISHED", "BLUE_WON", "RED_WON"]
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+
+def pack_move(move):
+    """Receives a move as a tuple (start square, end square) and returns it packed into a 16-bit number"""
+    return move[0] * NUM_SQUARES + move[1]
+
+
+def unpack_move(packed_move):
+    """Receives a move packed by pack_move and returns it as a tuple (start square, end square)"""
+    return divmod(packed_move, NUM_SQUARES)
+
+
+class ArchiveWriter():
+    """Writes games to an archive file one at a time, so a large archive never has to be held in memory. The number of
+    games in the file header is filled in when the writer is closed."""
+
+    def __init__(self, path):
+        """Creates the archive file, replacing any file already at the path, and writes the file header"""
+        self._file = open(path, "wb")
+        self._game_count = 0
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def write_game(self, moves, game_id, result="UNFINISHED", metadata=None):
+        """
+        Receives the moves of a game as (start square, end square) tuples, the game's ID, its result and optionally a
+        dictionary of extra metadata, such as where the game came from, and adds the game to the archive
+        """
+        game_metadata = dict(metadata or {}, game_id=game_id)
+        metadata_bytes = json.dumps(game_metadata, separators=(",", ":")).encode("utf-8")
+        packed_moves = [pack_move(move) for move in moves]
+
+        self._file.write(GAME_HEADER.pack(len(metadata_bytes)))
+        self._file.write(metadata_bytes)
+        self._file.write(GAME_TRAILER.pack(RESULT_CODES[result], len(packed_moves)))
+        self._file.write(struct.pack("<%dH" % len(packed_moves), *packed_moves))
+        self._game_count += 1
+
+    def get_game_count(self):
+        """Returns the number of games written so far"""
+        return self._game_count
+
+    def close(self):
+        """Fills in the number of games in the file header and closes the file"""
+        self._file.seek(0)
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, self._game_count))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArchivedGame():
+    """A game read from an archive: its metadata, result and moves"""
+
+    def __init__(self, metadata, result, packed_moves):
+        """Initializes the game with its metadata dictionary, its result and its moves as packed 16-bit numbers"""
+        self._metadata = metadata
+        self._result = result
+        self._packed_moves = packed_moves
+
+    def get_game_id(self):
+        """Returns the game's ID"""
+        return self._metadata["game_id"]
+
+    def get_metadata(self):
+        """Returns the game's metadata dictionary"""
+        return self._metadata
+
+    def get_result(self):
+        """Returns the result stored for the game"""
+        return self._result
+
+    def get_move_count(self):
+        """Returns the number of moves in the game"""
+        return len(self._packed_moves)
+
+    def get_moves(self):
+        """Returns the game's moves as a list of (start square, end square) tuples"""
+        return [unpack_move(packed_move) for packed_move in self._packed_moves]
+
+    def get_move_names(self):
+        """Returns the game's moves as a list of (start, end) tuples in algebraic notation, as make_move takes them"""
+        return [(square_name(start), square_name(end)) for start, end in self.get_moves()]
+
+    def replay(self, recorder=None):
+        """
+        Replays the game's moves through JanggiGame.make_move. Returns the game, and the index of the first move that
+        was rejected as illegal, or None if every move was legal. The replay stops at the first illegal move.
+        """
+        game = JanggiGame(recorder=recorder, game_id=self.get_game_id())
+        for index, (start_pos, end_pos) in enumerate(self.get_move_names()):
+            if not game.make_move(start_pos, end_pos):
+                return game, index
+        return game, None
+
+
+class ArchiveReader():
+    """Reads the games in an archive file one at a time. The file is memory-mapped, so only the parts being read are
+    brought into memory, however large the archive is."""
+
+    def __init__(self, path):
+        """Opens and maps the archive file, and checks its header"""
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self._game_count = FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("%s is not a version %d Janggi game archive" % (path, VERSION))
+
+    def get_game_count(self):
+        """Returns the number of games in the archive"""
+        return self._game_count
+
+    def __iter__(self):
+        """Yields the games in the archive, in the order they were written, as ArchivedGame objects"""
+        data = self._map
+        offset = FILE_HEADER.size
+        for _ in range(self._game_count):
+            metadata_length, = GAME_HEADER.unpack_from(data, offset)
+            offset += GAME_HEADER.size
+            metadata = json.loads(data[offset:offset + metadata_length].decode("utf-8"))
+            offset += metadata_length
+            result_code, move_count = GAME_TRAILER.unpack_from(data, offset)
+            offset += GAME_TRAILER.size
+            packed_moves = struct.unpack_from("<%dH" % move_count, data, offset)
+            offset += 2 * move_count
+            yield ArchivedGame(metadata, RESULTS[result_code], packed_moves)
+
+    def close(self):
+        """Unmaps and closes the archive file"""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_text_records(lines, name=None):
+    """
+    Receives the lines of a text game record and yields its games as (game ID, moves, result) tuples, with moves as a
+    list of (start, end) tuples in algebraic notation. Games are yielded as soon as they end, so only the games still
+    being played are held in memory, and games that never ended are yielded at the end as 'UNFINISHED'.
+
+    Lines written by recorder.FileRecorder start with the game ID, so games can be interleaved. Lines written by older
+    versions of the game have no game ID and are split into games by LegacyGameSplitter.
+
+    Raises a ValueError naming the record and the line if a line is neither a move nor a result. The record is named
+    by name, or by the name of the file the lines are read from.
+    """
+    if name is None:
+        name = getattr(lines, "name", "text record")
+    games = {}
+    splitter = LegacyGameSplitter()
+    legacy_count = 0
+    for line_number, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) == 1 and "->" in fields[0]:
+            start_pos, end_pos = fields[0].split("->")
+            finished_game = splitter.add_move(start_pos, end_pos)
+            if finished_game is not None:
+                legacy_count += 1
+                yield ("move_list-%d" % legacy_count,) + finished_game
+        elif "->" in fields[-1]:
+            games.setdefault(fields[0], []).append(tuple(fields[-1].split("->")))
+        elif len(fields) == 2 and fields[1] in RESULT_CODES:
+            yield fields[0], games.pop(fields[0], []), fields[1]
+        else:
+            raise ValueError("%s, line %d: not a move or a result: %r" % (name, line_number, line.strip()))
+
+    for game_id, moves in games.items():
+        yield game_id, moves, "UNFINISHED"
+
+    finished_game = splitter.finish()
+    if finished_game is not None:
+        yield ("move_list-%d" % (legacy_count + 1),) + finished_game
+
+
+class LegacyGameSplitter():
+    """
+    Splits the moves from an old move_list.txt file into games. Those files have every game appended together with no
+    game IDs, and leave out passes. The moves are replayed as they are added: each time the game ends or a move is
+    rejected, that move starts a new game, and a pass is put back in wherever the same player moves twice in a row.
+    """
+
+    def __init__(self):
+        """Initializes the splitter with a new game and no moves"""
+        self._game = JanggiGame()
+        self._moves = []
+
+    def add_move(self, start_pos, end_pos):
+        """
+        Receives the next move from the file. Returns the previous game as a tuple (moves, result) if the move starts a
+        new game, and None otherwise.
+        """
+        game = self._game
+        finished_game = None
+
+        # Put back a pass if the piece belongs to the player who isn't on the move
+        start = game.parse_position(start_pos)
+        if start is not None and game.get_game_state() == "UNFINISHED" and (
+                not game.piece_belongs_to_turntaker(start) and game.get_piece_at(start) is not None):
+            general_pos = square_name(game.get_piece_from_id(game.get_current_turn()[0].lower() + "@").get_square())
+            if game.make_move(general_pos, general_pos):
+                self._moves.append((general_pos, general_pos))
+
+        if not game.make_move(start_pos, end_pos):
+            # The move doesn't fit the game so far, so it must be the first move of the next game
+            finished_game = self.finish()
+            if not self._game.make_move(start_pos, end_pos):
+                # Not a legal opening move either, so there is nothing to keep
+                return finished_game
+        self._moves.append((start_pos, end_pos))
+        return finished_game
+
+    def finish(self):
+        """Returns the game so far as a tuple (moves, result), or None if it has no moves, and starts a new game"""
+        finished_game = (self._moves, self._game.get_game_state()) if self._moves else None
+        self._game = JanggiGame()
+        self._moves = []
+        return finished_game
+
+
+def convert_text_records(text_path, archive_path):
+    """
+    Receives the path of a text game record, such as move_list.txt, and the path of an archive to create, and writes
+    every game in the record to the archive. Returns the number of games written.
+    """
+    with open(text_path) as infile, ArchiveWriter(archive_path) as writer:
+        for game_id, moves, result in read_text_records(infile):
+            writer.write_game([(position_square(start), position_square(end)) for start, end in moves], game_id, result,
+                              {"source": text_path})
+        return writer.get_game_count()
+
+
+def position_square(pos):
+    """Receives a position in algebraic notation, such as "e9", and returns its square on the compact board. Raises a
+    ValueError if the position isn't on the board."""
+    if pos not in SQUARE_NUMBERS:
+        raise ValueError("not a square on the board: %r" % (pos,))
+    return SQUARE_NUMBERS[pos]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Janggi game archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="convert a text game record, such as move_list.txt")
+    convert_parser.add_argument("text_path")
+    convert_parser.add_argument("archive_path")
+    list_parser = subparsers.add_parser("list", help="list the games in an archive")
+    list_parser.add_argument("archive_path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert_text_records(args.text_path, args.archive_path)
+        print("wrote %d games to %s" % (count, args.archive_path))
+    else:
+        with ArchiveReader(args.archive_path) as reader:
+            for archived_game in reader:
+                print("%s %s %d moves" % (archived_game.get_game_id(), archived_game.get_result(),
+                                          archived_game.get_move_count()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Legal move generation for many positions at once with NumPy, for building datasets. Positions are given as an array of
+boards of shape (N, 10, 9), holding the same piece codes as the compact board (see board.py), and a vector saying whose
+turn it is in each. The rules are the same as the rules engine's, and are built from the same tables in board.py.
+
+Every way a piece can move is listed once in a table of move patterns: the square it moves from, the square it moves to,
+the piece it needs, and the squares in between that must be empty (or, for a cannon, hold exactly one piece that isn't a
+cannon). Checking a pattern on a board is then a few array lookups, so all the patterns for all the positions are
+checked together. A move is legal if, after making it, no pattern for the opponent reaches the player's general.
+
+Passing is included as a move from the general's square to itself, unless the player is in check, as it is in
+JanggiGame.legal_moves. The state of the game isn't part of a position, so moves are generated even if the game is over.
+
+NumPy is only needed for this module, not for the rules engine.
+"""
+
+import numpy as np
+from board import *
+
+# Boards are given an extra square at the end, which is always empty. Patterns that need fewer squares in between than
+# the longest use it as padding.
+EMPTY_SQUARE = NUM_SQUARES
+MAX_BETWEEN = 8
+
+# A code no piece has, for the pattern used as padding in the pattern tables, which never matches
+NO_PIECE = TEAM_MASK | TYPE_MASK
+
+
+def build_patterns():
+    """
+    Returns the move patterns as a tuple of arrays, each with one entry per pattern: origin squares, destination
+    squares, the code of the piece needed on the origin, the team bit of that piece, the squares in between (padded with
+    EMPTY_SQUARE), and whether the pattern is a cannon jump. The last pattern is a padding pattern that never matches.
+    """
+    origins, destinations, codes, teams, betweens, cannon_jumps = [], [], [], [], [], []
+
+    def add(origin, destination, team, piece_type, between=(), cannon_jump=False):
+        origins.append(origin)
+        destinations.append(destination)
+        codes.append(team | piece_type)
+        teams.append(team)
+        betweens.append(tuple(between) + (EMPTY_SQUARE,) * (MAX_BETWEEN - len(between)))
+        cannon_jumps.append(cannon_jump)
+
+    for team in (BLUE, RED):
+        for origin in range(NUM_SQUARES):
+            for ray in RAYS[origin]:
+                for index, destination in enumerate(ray):
+                    add(origin, destination, team, CHARIOT, ray[:index])
+                    if index > 0:
+                        add(origin, destination, team, CANNON, ray[:index], True)
+            for destination, leg in HORSE_MOVES[origin]:
+                add(origin, destination, team, HORSE, (leg,))
+            for destination, first_leg, second_leg in ELEPHANT_MOVES[origin]:
+                add(origin, destination, team, ELEPHANT, (first_leg, second_leg))
+            for destination in PALACE_MOVES[team][origin]:
+                add(origin, destination, team, GUARD)
+                add(origin, destination, team, GENERAL)
+            for destination in SOLDIER_MOVES[team][origin]:
+                add(origin, destination, team, SOLDIER)
+
+    origins.append(EMPTY_SQUARE)
+    destinations.append(EMPTY_SQUARE)
+    codes.append(NO_PIECE)
+    teams.append(0)
+    betweens.append((EMPTY_SQUARE,) * MAX_BETWEEN)
+    cannon_jumps.append(False)
+
+    return (np.array(origins, dtype=np.intp), np.array(destinations, dtype=np.intp), np.array(codes, dtype=np.int8),
+            np.array(teams, dtype=np.int8), np.array(betweens, dtype=np.intp), np.array(cannon_jumps, dtype=bool))
+
+
+def build_attack_patterns():
+    """
+    Returns an array of shape (2, 91, longest list) holding, for each team (0 for Blue, 1 for Red) and each square, the
+    patterns that end on the square, padded with the padding pattern
+    """
+    lists = [[[] for square in range(NUM_SQUARES + 1)] for team in range(2)]
+    for pattern in range(PADDING_PATTERN):
+        lists[int(PATTERN_TEAMS[pattern] == RED)][PATTERN_DESTINATIONS[pattern]].append(pattern)
+    return padded_table(lists)
+
+
+def build_piece_patterns():
+    """
+    Returns an array of shape (32, 91, longest list) holding, for each piece code and each square, the patterns for that
+    piece moving from the square, padded with the padding pattern
+    """
+    lists = [[[] for square in range(NUM_SQUARES + 1)] for code in range(TEAM_MASK + TYPE_MASK + 1)]
+    for pattern in range(PADDING_PATTERN):
+        lists[PATTERN_CODES[pattern]][PATTERN_ORIGINS[pattern]].append(pattern)
+    return padded_table(lists)
+
+
+def build_attack_lines():
+    """
+    Returns a boolean array of shape (2, 91, 91) that is True for each team (0 for Blue, 1 for Red), square, and square
+    between one of that team's pieces and the first square on one of its attack patterns. A move that leaves and lands
+    off these squares, and doesn't move the general, can't change whether the general is attacked.
+    """
+    lines = np.zeros((2, NUM_SQUARES + 1, NUM_SQUARES + 1), dtype=bool)
+    for team in range(2):
+        for square in range(NUM_SQUARES):
+            lines[team, square, PATTERN_BETWEEN[ATTACK_PATTERNS[team, square]].ravel()] = True
+    lines[:, :, EMPTY_SQUARE] = False
+    return lines
+
+
+def padded_table(lists):
+    """Receives nested lists of lists of patterns, and returns them as an array, with the innermost lists padded to
+    the same length with the padding pattern"""
+    longest = max(len(patterns) for outer in lists for patterns in outer)
+    return np.array([[patterns + [PADDING_PATTERN] * (longest - len(patterns)) for patterns in outer] for outer in lists],
+                    dtype=np.intp)
+
+
+(PATTERN_ORIGINS, PATTERN_DESTINATIONS, PATTERN_CODES, PATTERN_TEAMS, PATTERN_BETWEEN,
+ PATTERN_CANNON_JUMPS) = build_patterns()
+PADDING_PATTERN = len(PATTERN_ORIGINS) - 1
+ATTACK_PATTERNS = build_attack_patterns()
+PIECE_PATTERNS = build_piece_patterns()
+ATTACK_LINES = build_attack_lines()
+
+
+def patterns_match(boards, rows, patterns):
+    """
+    Receives padded boards of shape (M, 91), and arrays of the same shape of rows into the boards and of patterns, and
+    returns a boolean array of that shape saying whether the piece the pattern needs can move that way on that board
+    """
+    between_codes = boards[rows[..., None], PATTERN_BETWEEN[patterns]]
+    pieces_between = np.count_nonzero(between_codes, axis=-1)
+    destination_codes = boards[rows, PATTERN_DESTINATIONS[patterns]]
+
+    matches = boards[rows, PATTERN_ORIGINS[patterns]] == PATTERN_CODES[patterns]
+    matches &= (destination_codes & PATTERN_TEAMS[patterns]) == 0
+    cannon_jumps = PATTERN_CANNON_JUMPS[patterns]
+    cannon_jump_ok = (pieces_between == 1) & ~((between_codes & TYPE_MASK) == CANNON).any(axis=-1) & (
+        (destination_codes & TYPE_MASK) != CANNON)
+    matches &= np.where(cannon_jumps, cannon_jump_ok, pieces_between == 0)
+    return matches
+
+
+def squares_attacked(boards, squares, attacking_teams):
+    """
+    Receives padded boards of shape (M, 91), and for each board a square and the team (0 for Blue, 1 for Red) to check
+    it against. Returns a boolean array saying whether any of that team's pieces could move onto the square.
+    """
+    patterns = ATTACK_PATTERNS[attacking_teams, squares]
+    # Only a few of the patterns have their piece in place, so the squares in between are only read for those
+    rows, columns = np.nonzero(boards[np.arange(len(boards))[:, None], PATTERN_ORIGINS[patterns]] ==
+                               PATTERN_CODES[patterns])
+    attacked = np.zeros(len(boards), dtype=bool)
+    attacked[rows[patterns_match(boards, rows, patterns[rows, columns])]] = True
+    return attacked
+
+
+def legal_move_arrays(boards, red_to_move, chunk_size=1024):
+    """
+    Receives an array of boards of shape (N, 10, 9) holding piece codes, and a boolean vector of length N that is True
+    where it is Red's turn. Returns the legal moves of every position as three arrays (positions, starts, ends) of the
+    same length, giving the index of the position and the start and end squares of each move, sorted by position, and
+    a boolean vector of length N that is True where the player to move is in check.
+
+    The positions are worked through chunk_size at a time, to limit the memory used. Raises a ValueError if a position
+    doesn't have a general for each player.
+    """
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, NUM_SQUARES)
+    red_to_move = np.asarray(red_to_move, dtype=bool).reshape(-1)
+    if len(red_to_move) != len(boards):
+        raise ValueError("expected a side to move for each of the %d boards, got %d" % (len(boards), len(red_to_move)))
+
+    results = [_legal_moves_chunk(boards[first:first + chunk_size], red_to_move[first:first + chunk_size], first)
+               for first in range(0, len(boards), chunk_size)]
+    if not results:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, empty, np.zeros(0, dtype=bool)
+    return tuple(np.concatenate(arrays) for arrays in zip(*results))
+
+
+def _legal_moves_chunk(boards, red_to_move, first_position):
+    """Finds the legal moves for one chunk of positions for legal_move_arrays, numbering them from first_position"""
+    count = len(boards)
+    padded = np.zeros((count, NUM_SQUARES + 1), dtype=np.int8)
+    padded[:, :NUM_SQUARES] = boards
+    team_bits = np.where(red_to_move, RED, BLUE).astype(np.int8)
+    opponents = np.where(red_to_move, 0, 1)
+
+    # Find each player's general
+    has_general = padded == (team_bits | GENERAL)[:, None]
+    if not has_general.any(axis=1).all() or not (padded == ((TEAM_MASK ^ team_bits) | GENERAL)[:, None]).any(
+            axis=1).all():
+        raise ValueError("every position must have a general for each player")
+    general_squares = has_general.argmax(axis=1)
+    in_check = squares_attacked(padded, general_squares, opponents)
+
+    # Find the moves each of the player's pieces could make if check didn't matter, from the patterns for the piece on
+    # its square
+    rows, squares = np.nonzero(padded & team_bits[:, None])
+    piece_patterns = PIECE_PATTERNS[padded[rows, squares], squares]
+    entries, columns = np.nonzero(piece_patterns != PADDING_PATTERN)
+    rows, patterns = rows[entries], piece_patterns[entries, columns]
+    possible = patterns_match(padded, rows, patterns)
+    rows, patterns = rows[possible], patterns[possible]
+    starts = PATTERN_ORIGINS[patterns]
+    ends = PATTERN_DESTINATIONS[patterns]
+
+    # Make each move that could leave the general attacked on a copy of its board, and drop the ones that do
+    kings = general_squares[rows]
+    risky = np.nonzero(in_check[rows] | (starts == kings) | ATTACK_LINES[opponents[rows], kings, starts] |
+                       ATTACK_LINES[opponents[rows], kings, ends])[0]
+    after = padded[rows[risky]]
+    moves = np.arange(len(risky))
+    after[moves, ends[risky]] = after[moves, starts[risky]]
+    after[moves, starts[risky]] = EMPTY
+    kings = np.where(starts[risky] == kings[risky], ends[risky], kings[risky])
+    legal = np.ones(len(rows), dtype=bool)
+    legal[risky] = ~squares_attacked(after, kings, opponents[rows[risky]])
+    rows, starts, ends = rows[legal], starts[legal], ends[legal]
+
+    # Passing is legal unless the player is in check
+    passing = np.nonzero(~in_check)[0]
+    rows = np.concatenate((rows, passing))
+    starts = np.concatenate((starts, general_squares[passing]))
+    ends = np.concatenate((ends, general_squares[passing]))
+
+    order = np.lexsort((ends, starts, rows))
+    return rows[order] + first_position, starts[order], ends[order], in_check
+
+
+def legal_move_masks(boards, red_to_move, chunk_size=1024):
+    """
+    Receives the same arguments as legal_move_arrays, and returns a boolean array of shape (N, 90, 90) that is True
+    where the move from the second index to the third is legal in the position, and the vector of in-check flags
+    """
+    positions, starts, ends, in_check = legal_move_arrays(boards, red_to_move, chunk_size)
+    masks = np.zeros((len(in_check), NUM_SQUARES, NUM_SQUARES), dtype=bool)
+    masks[positions, starts, ends] = True
+    return masks, in_check
+
+
+def boards_from_games(games):
+    """Receives a list of games, and returns their positions as an array of boards and a vector of whose turn it is,
+    as legal_move_arrays takes them"""
+    boards = np.array([np.frombuffer(bytes(game.get_squares()), dtype=np.int8) for game in games],
+                      dtype=np.int8).reshape(-1, ROWS, COLS)
+    red_to_move = np.array([game.get_current_turn() == "Red" for game in games], dtype=bool)
+    return boards, red_to_move
@@ -0,0 +1,244 @@
+"""
+Benchmarks for the Janggi rules engine. Each benchmark is a function registered in BENCHMARKS, and can be run from the
+command line with: python benchmark.py <name> [--repeat N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from perft import SAMPLE_GAME
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Code run in a fresh interpreter to time an import. The result is printed as "<seconds> <pygame loaded>"
+IMPORT_TIMER = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start, 'pygame' in sys.modules)
+"""
+
+# The rules engine on its own, as used by validation workers
+HEADLESS_IMPORT = "import JanggiGame"
+
+# The rules engine plus the GUI layer with every piece image bound, which is what importing JanggiGame used to cost
+GUI_IMPORT = """
+import JanggiGame, Sprites
+game = JanggiGame.JanggiGame()
+for player in ("Blue", "Red"):
+    for piece in game.get_piece_dictionary(player).values():
+        Sprites.get_icon(piece)
+"""
+
+
+def time_import(statement, repeat):
+    """
+    Receives an import statement and a repeat count. Runs the statement in a fresh interpreter repeat times and returns
+    the list of timings in seconds, and whether pygame ended up loaded. Returns None if the statement failed to import.
+    """
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    code = IMPORT_TIMER.format(statement=statement)
+    timings = []
+    pygame_loaded = False
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, env=env, capture_output=True,
+                                text=True)
+        if result.returncode != 0:
+            return None, False
+        seconds, pygame_loaded = result.stdout.split()
+        timings.append(float(seconds))
+    return timings, pygame_loaded == "True"
+
+
+def bench_import(repeat):
+    """
+    Compares the time it takes to import the headless rules engine with the time it takes to import the engine
+    together with pygame and the piece images
+    """
+    headless, headless_pygame = time_import(HEADLESS_IMPORT, repeat)
+    gui, _ = time_import(GUI_IMPORT, repeat)
+
+    if headless is None:
+        print("headless rules engine: unavailable (the import failed)")
+    else:
+        print("headless rules engine: %8.2f ms (pygame loaded: %s)" % (statistics.median(headless) * 1000,
+                                                                       headless_pygame))
+    if gui is None:
+        print("GUI layer:             unavailable (pygame is not installed)")
+    else:
+        print("GUI layer:             %8.2f ms" % (statistics.median(gui) * 1000))
+    if headless is not None and gui is not None:
+        print("saving per worker:     %8.2f ms" % ((statistics.median(gui) - statistics.median(headless)) * 1000))
+
+
+def bench_make_move(repeat):
+    """
+    Replays SAMPLE_GAME through make_move repeat times and reports the number of moves made per second
+    """
+    from JanggiGame import JanggiGame
+
+    moves = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        game = JanggiGame()
+        for start_pos, end_pos in SAMPLE_GAME:
+            game.make_move(start_pos, end_pos)
+            moves += 1
+    elapsed = time.perf_counter() - start
+    print("make_move: %d moves in %.3f s, %.0f moves/s (final state %s)" % (moves, elapsed, moves / elapsed,
+                                                                           game.get_game_state()))
+
+
+def bench_record(repeat):
+    """
+    Replays SAMPLE_GAME repeat times with each kind of recorder, and reports the time make_move takes per move. The
+    "open per move" recorder writes the way games used to be recorded, opening the file in append mode for every move.
+    """
+    from JanggiGame import JanggiGame
+    from recorder import Recorder, MemoryRecorder, FileRecorder
+
+    class OpenPerMoveRecorder(Recorder):
+        def __init__(self, path):
+            self._path = path
+
+        def record_move(self, game_id, start_pos, end_pos):
+            with open(self._path, "a") as outfile:
+                outfile.write(start_pos + "->" + end_pos + "\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorders = [
+            ("none", Recorder()),
+            ("in memory", MemoryRecorder()),
+            ("open per move", OpenPerMoveRecorder(os.path.join(directory, "move_list.txt"))),
+            ("file per game", FileRecorder(os.path.join(directory, "{game_id}.txt"))),
+            ("shared file", FileRecorder(os.path.join(directory, "games.txt"))),
+        ]
+        for name, recorder in recorders:
+            moves = 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                game = JanggiGame(recorder=recorder)
+                for start_pos, end_pos in SAMPLE_GAME:
+                    game.make_move(start_pos, end_pos)
+                    moves += 1
+            elapsed = time.perf_counter() - start
+            recorder.close()
+            print("%-15s %8.1f us per move" % (name + ":", elapsed / moves * 1e6))
+
+
+def bench_footprint(repeat):
+    """
+    Reports the memory allocated for each new game, and how much of it is the board
+    """
+    from JanggiGame import JanggiGame
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [JanggiGame() for _ in range(repeat)]
+    per_game = (tracemalloc.get_traced_memory()[0] - before) / repeat
+    tracemalloc.stop()
+
+    game = games[0]
+    string_board = game.get_board()
+    string_board_size = sys.getsizeof(string_board) + sum(sys.getsizeof(row) for row in string_board)
+    compact_board_size = sys.getsizeof(game.get_squares()) * 2
+    print("per game:              %8.0f bytes" % per_game)
+    print("compact board:         %8d bytes" % compact_board_size)
+    print("string board (compat): %8d bytes" % string_board_size)
+
+
+def bench_clone(repeat):
+    """
+    Compares the time it takes to branch a game part way through SAMPLE_GAME with clone and with copy.deepcopy
+    """
+    import copy
+    from JanggiGame import JanggiGame
+
+    game = JanggiGame()
+    for start_pos, end_pos in SAMPLE_GAME[:18]:
+        game.make_move(start_pos, end_pos)
+
+    copies = 1000 * repeat
+    for name, branch in (("clone", game.clone), ("copy.deepcopy", lambda: copy.deepcopy(game))):
+        start = time.perf_counter()
+        for _ in range(copies):
+            branch()
+        elapsed = time.perf_counter() - start
+        print("%-15s %8.1f us per copy" % (name + ":", elapsed / copies * 1e6))
+
+
+def bench_batch_moves(repeat):
+    """
+    Compares the time it takes to find the legal moves of every position in SAMPLE_GAME with legal_moves, one position
+    at a time, and with batch_moves.legal_move_arrays, all at once
+    """
+    from JanggiGame import JanggiGame
+    try:
+        from batch_moves import boards_from_games, legal_move_arrays
+    except ImportError:
+        print("batch move generation unavailable (NumPy is not installed)")
+        return
+
+    game = JanggiGame()
+    games = [game.clone()]
+    for start_pos, end_pos in SAMPLE_GAME[:-1]:
+        game.make_move(start_pos, end_pos)
+        games.append(game.clone())
+    games *= repeat
+    boards, red_to_move = boards_from_games(games)
+
+    start = time.perf_counter()
+    moves = sum(len(list(game.legal_moves())) for game in games)
+    one_at_a_time = time.perf_counter() - start
+    start = time.perf_counter()
+    positions = legal_move_arrays(boards, red_to_move)[0]
+    batched = time.perf_counter() - start
+    print("%d positions, %d legal moves" % (len(games), moves))
+    print("legal_moves:       %8.1f us per position" % (one_at_a_time / len(games) * 1e6))
+    print("legal_move_arrays: %8.1f us per position (%d moves)" % (batched / len(games) * 1e6, len(positions)))
+
+
+def bench_search(repeat):
+    """
+    Searches the middlegame position from perft.py to a fixed depth repeat times, and reports the nodes searched and the
+    nodes searched per second
+    """
+    from perft import load_position
+    from search import Searcher, move_name
+
+    nodes = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = Searcher().best_move(load_position("middlegame"), depth=3)
+        nodes += result["nodes"]
+    elapsed = time.perf_counter() - start
+    print("search: depth %d, %d nodes per search, %.0f nodes/s (best move %s, score %d)" % (
+        result["depth"], result["nodes"], nodes / elapsed, move_name(result["move"]), result["score"]))
+
+
+BENCHMARKS = {
+    "import": bench_import,
+    "make_move": bench_make_move,
+    "footprint": bench_footprint,
+    "record": bench_record,
+    "clone": bench_clone,
+    "batch_moves": bench_batch_moves,
+    "search": bench_search,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the Janggi rules engine")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=10, help="number of times to repeat each measurement")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Square numbering and piece codes for the compact board used by the Janggi rules engine. The board is stored as an array
+of 90 squares numbered row by row from the Red side, so the square for [row, col] is row * 9 + col. Each square holds a
+small integer piece code: 0 for an empty square, or a team bit combined with the piece type.
+"""
+
+import random
+
+ROWS = 10
+COLS = 9
+NUM_SQUARES = ROWS * COLS
+
+EMPTY = 0
+
+# Piece types, kept in the low three bits of a piece code
+GENERAL = 1
+GUARD = 2
+ELEPHANT = 3
+HORSE = 4
+CHARIOT = 5
+CANNON = 6
+SOLDIER = 7
+TYPE_MASK = 7
+
+# Team bits
+BLUE = 8
+RED = 16
+TEAM_MASK = BLUE | RED
+
+TEAM_BITS = {"Blue": BLUE, "Red": RED}
+
+# The symbols used for each piece type in piece IDs, such as "b@" for the Blue general
+SYMBOL_TYPES = {"@": GENERAL, "$": GUARD, "~": ELEPHANT, "^": HORSE, "%": CHARIOT, "#": CANNON, "-": SOLDIER}
+
+# The letters used for each piece type in position strings (see JanggiGame.to_position), upper case for Blue pieces and
+# lower case for Red pieces
+POSITION_LETTERS = {GENERAL: "g", GUARD: "a", ELEPHANT: "e", HORSE: "h", CHARIOT: "r", CANNON: "c", SOLDIER: "s"}
+LETTER_TYPES = {letter: piece_type for piece_type, letter in POSITION_LETTERS.items()}
+
+
+def to_square(row, col):
+    """Receives a row and a column and returns the index of that square on the compact board"""
+    return row * COLS + col
+
+
+def square_to_location(square):
+    """Receives the index of a square on the compact board and returns its location as a list [row, col]"""
+    return [square // COLS, square % COLS]
+
+
+def squares_mask(squares):
+    """Receives some squares and returns them as a bitmask, with bit n set for square n. Move lists record the squares
+    they depend on this way, so a move can find the lists it affects with a single AND."""
+    mask = 0
+    for square in squares:
+        mask |= 1 << square
+    return mask
+
+
+def square_name(square):
+    """Receives the index of a square on the compact board and returns its name in algebraic notation, such as e9"""
+    return chr(ord("a") + square % COLS) + str(square // COLS + 1)
+
+
+def on_board(row, col):
+    """Returns True if the given row and column are on the board, and False otherwise"""
+    return 0 <= row < ROWS and 0 <= col < COLS
+
+
+# The square with each name in algebraic notation, from a1 to i10, for checking that a name is on the board
+SQUARE_NUMBERS = {square_name(square): square for square in range(NUM_SQUARES)}
+
+
+# The two palaces, and the squares on their diagonal lines (the corners and the center)
+BLUE_PALACE = frozenset(to_square(row, col) for row in (7, 8, 9) for col in (3, 4, 5))
+RED_PALACE = frozenset(to_square(row, col) for row in (0, 1, 2) for col in (3, 4, 5))
+PALACES = {BLUE: BLUE_PALACE, RED: RED_PALACE}
+PALACE_CENTERS = (to_square(8, 4), to_square(1, 4))
+PALACE_DIAGONALS = frozenset(center + offset for center in PALACE_CENTERS for offset in (0, -10, -8, 8, 10))
+
+ORTHOGONAL_STEPS = ((-1, 0), (1, 0), (0, 1), (0, -1))
+DIAGONAL_STEPS = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+
+
+def palace_diagonal_step(square, row_step, col_step):
+    """Receives a square and a diagonal direction. Returns the square reached by moving one step along a palace
+    diagonal line in that direction, or None if there is no palace line to follow"""
+    row = square // COLS + row_step
+    col = square % COLS + col_step
+    if square not in PALACE_DIAGONALS or not on_board(row, col):
+        return None
+    destination = to_square(row, col)
+    # Every diagonal line runs through a palace center, so one end of the step must be the center
+    if destination in PALACE_DIAGONALS and (square in PALACE_CENTERS or destination in PALACE_CENTERS):
+        return destination
+    return None
+
+
+def build_rays(square):
+    """Returns the lines a chariot or cannon on the given square can travel along, as a tuple of tuples of squares in
+    the order they are reached. Includes the palace diagonals when the square is on one."""
+    rays = []
+    for row_step, col_step in ORTHOGONAL_STEPS:
+        row = square // COLS + row_step
+        col = square % COLS + col_step
+        ray = []
+        while on_board(row, col):
+            ray.append(to_square(row, col))
+            row += row_step
+            col += col_step
+        if ray:
+            rays.append(tuple(ray))
+    for row_step, col_step in DIAGONAL_STEPS:
+        ray = []
+        next_square = palace_diagonal_step(square, row_step, col_step)
+        while next_square is not None:
+            ray.append(next_square)
+            next_square = palace_diagonal_step(next_square, row_step, col_step)
+        if ray:
+            rays.append(tuple(ray))
+    return tuple(rays)
+
+
+def build_path_masks(square):
+    """Returns a dictionary mapping every square on the rays from the given square to the mask of the squares a
+    chariot or cannon reads to get that far: the squares after the given one, up to and including the mapped square"""
+    path_masks = {}
+    for ray in RAYS[square]:
+        for index in range(len(ray)):
+            path_masks[ray[index]] = squares_mask(ray[:index + 1])
+    return path_masks
+
+
+def build_leaps(square, first_steps, diagonal_steps):
+    """Returns the moves of a horse (one diagonal step) or an elephant (two diagonal steps) from the given square, as
+    a tuple of (destination, leg, ...) tuples. The legs are the squares passed over, which must be empty for the move
+    to be made."""
+    leaps = []
+    for row_step, col_step in first_steps:
+        for side in (-1, 1):
+            # The diagonal steps continue forward from the first step, turning to one side
+            diagonal = (row_step or side, col_step or side)
+            row = square // COLS + row_step
+            col = square % COLS + col_step
+            path = []
+            for _ in range(diagonal_steps + 1):
+                path.append((row, col))
+                row += diagonal[0]
+                col += diagonal[1]
+            destination = path.pop()
+            if all(on_board(r, c) for r, c in path) and on_board(destination[0], destination[1]):
+                leaps.append((to_square(destination[0], destination[1]),) + tuple(to_square(r, c) for r, c in path))
+    return tuple(leaps)
+
+
+def build_palace_moves(square, team):
+    """Returns the squares a general or guard on the given square can step to without leaving its palace"""
+    palace = PALACES[team]
+    if square not in palace:
+        return ()
+    moves = []
+    for row_step, col_step in ORTHOGONAL_STEPS:
+        destination = to_square(square // COLS + row_step, square % COLS + col_step)
+        if on_board(square // COLS + row_step, square % COLS + col_step) and destination in palace:
+            moves.append(destination)
+    for row_step, col_step in DIAGONAL_STEPS:
+        destination = palace_diagonal_step(square, row_step, col_step)
+        if destination is not None:
+            moves.append(destination)
+    return tuple(moves)
+
+
+def build_soldier_moves(square, team):
+    """Returns the squares a soldier on the given square can step to: forward, sideways, or forward along a palace
+    diagonal"""
+    forward = -1 if team == BLUE else 1
+    moves = []
+    for row_step, col_step in ((forward, 0), (0, 1), (0, -1)):
+        row = square // COLS + row_step
+        col = square % COLS + col_step
+        if on_board(row, col):
+            moves.append(to_square(row, col))
+    for col_step in (1, -1):
+        destination = palace_diagonal_step(square, forward, col_step)
+        if destination is not None:
+            moves.append(destination)
+    return tuple(moves)
+
+
+def build_reverse_leaps(leap_table):
+    """Receives a table of horse or elephant moves and turns it around: returns a table giving, for each square, the
+    (origin, leg, ...) tuples of the moves that land on it. Used to find the pieces attacking a square."""
+    reverse = [[] for _ in range(NUM_SQUARES)]
+    for origin in range(NUM_SQUARES):
+        for leap in leap_table[origin]:
+            reverse[leap[0]].append((origin,) + leap[1:])
+    return tuple(tuple(leaps) for leaps in reverse)
+
+
+def build_reverse_steps(step_table):
+    """Receives a table of single-step moves and turns it around: returns a table giving, for each square, the squares
+    a piece could step onto it from"""
+    reverse = [[] for _ in range(NUM_SQUARES)]
+    for origin in range(NUM_SQUARES):
+        for destination in step_table[origin]:
+            reverse[destination].append(origin)
+    return tuple(tuple(origins) for origins in reverse)
+
+
+# Lookup tables, indexed by square, built once when the module is imported
+RAYS = tuple(build_rays(square) for square in range(NUM_SQUARES))
+PATH_MASKS = tuple(build_path_masks(square) for square in range(NUM_SQUARES))
+HORSE_MOVES = tuple(build_leaps(square, ORTHOGONAL_STEPS, 1) for square in range(NUM_SQUARES))
+ELEPHANT_MOVES = tuple(build_leaps(square, ORTHOGONAL_STEPS, 2) for square in range(NUM_SQUARES))
+PALACE_MOVES = {team: tuple(build_palace_moves(square, team) for square in range(NUM_SQUARES)) for team in (BLUE, RED)}
+SOLDIER_MOVES = {team: tuple(build_soldier_moves(square, team) for square in range(NUM_SQUARES)) for team in (BLUE, RED)}
+
+# The same moves turned around, giving for each square where the pieces that could move onto it must be
+HORSE_ATTACKS = build_reverse_leaps(HORSE_MOVES)
+ELEPHANT_ATTACKS = build_reverse_leaps(ELEPHANT_MOVES)
+PALACE_ATTACKS = {team: build_reverse_steps(PALACE_MOVES[team]) for team in (BLUE, RED)}
+SOLDIER_ATTACKS = {team: build_reverse_steps(SOLDIER_MOVES[team]) for team in (BLUE, RED)}
+
+# The squares each table entry reads, as bitmasks: the destinations, and for horses and elephants the blocking squares
+HORSE_MASKS = tuple(squares_mask(square for leap in leaps for square in leap) for leaps in HORSE_MOVES)
+ELEPHANT_MASKS = tuple(squares_mask(square for leap in leaps for square in leap) for leaps in ELEPHANT_MOVES)
+PALACE_MASKS = {team: tuple(squares_mask(moves) for moves in PALACE_MOVES[team]) for team in (BLUE, RED)}
+SOLDIER_MASKS = {team: tuple(squares_mask(moves) for moves in SOLDIER_MOVES[team]) for team in (BLUE, RED)}
+
+# Zobrist keys for hashing positions: a random 64-bit number for each piece code on each square, and one more that is
+# added when it is Red's turn. The key for a position is all of these XORed together, so a move can update it by XORing
+# out the pieces it moves or captures and XORing them back in where they end up. The generator is seeded so the keys,
+# and therefore the position keys, are the same in every process.
+_zobrist_random = random.Random(0x4A616E676769)
+ZOBRIST_KEYS = tuple(tuple(_zobrist_random.getrandbits(64) if code & TYPE_MASK else 0 for square in range(NUM_SQUARES))
+                     for code in range(TEAM_MASK + TYPE_MASK + 1))
+RED_TO_MOVE_KEY = _zobrist_random.getrandbits(64)
+
+
+# Values for the static evaluation, in tenths of a point. Each piece is worth its material value plus a bonus for the
+# square it stands on. Red, who moves second, is given the traditional deom bonus of 1.5 points.
+PIECE_VALUES = (0, 0, 30, 30, 50, 130, 70, 20)
+RED_DEOM = 15
+
+# The square bonuses for each piece type, for a Blue piece, laid out as the board is numbered: the first row is Red's
+# back rank and the last is Blue's. Red pieces use the same tables turned upside down.
+SQUARE_TABLES = {
+    GENERAL: (0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, -4, -2, -4, 0, 0, 0,
+              0, 0, 0, 0, 2, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0),
+    GUARD: (0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, -2, 0, -2, 0, 0, 0,
+            0, 0, 0, 0, 2, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0, 0),
+    ELEPHANT: (0, 0, 0, 0, 0, 0, 0, 0, 0,
+               0, 0, 0, 0, 0, 0, 0, 0, 0,
+               0, 0, 0, 0, 2, 0, 0, 0, 0,
+               0, 0, 0, 0, 0, 0, 0, 0, 0,
+               0, 0, 2, 0, 0, 0, 2, 0, 0,
+               0, 0, 0, 0, 2, 0, 0, 0, 0,
+               0, 2, 0, 0, 2, 0, 0, 2, 0,
+               -2, 0, 0, 2, 0, 2, 0, 0, -2,
+               0, 0, 2, 0, 2, 0, 2, 0, 0,
+               0, 0, 0, 0, 0, 0, 0, 0, 0),
+    HORSE: (-4, -2, 0, 0, 0, 0, 0, -2, -4,
+            0, 2, 4, 4, 2, 4, 4, 2, 0,
+            2, 4, 6, 6, 6, 6, 6, 4, 2,
+            2, 4, 6, 6, 6, 6, 6, 4, 2,
+            0, 4, 4, 6, 6, 6, 4, 4, 0,
+            0, 2, 4, 4, 4, 4, 4, 2, 0,
+            0, 2, 2, 4, 2, 4, 2, 2, 0,
+            0, 0, 2, 2, 0, 2, 2, 0, 0,
+            -2, 0, 0, 0, -4, 0, 0, 0, -2,
+            -4, -2, 0, -2, -4, -2, 0, -2, -4),
+    CHARIOT: (2, 2, 2, 4, 4, 4, 2, 2, 2,
+              2, 4, 4, 6, 6, 6, 4, 4, 2,
+              2, 2, 2, 4, 4, 4, 2, 2, 2,
+              2, 2, 2, 2, 2, 2, 2, 2, 2,
+              0, 2, 2, 2, 2, 2, 2, 2, 0,
+              0, 0, 2, 2, 2, 2, 2, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              -2, 0, 0, 0, 0, 0, 0, 0, -2,
+              -2, 0, 0, 0, 0, 0, 0, 0, -2,
+              -4, 0, 0, 2, 0, 2, 0, 0, -4),
+    CANNON: (2, 2, 0, -2, -4, -2, 0, 2, 2,
+             0, 2, 0, 0, -2, 0, 0, 2, 0,
+             0, 0, 0, 0, 0, 0, 0, 0, 0,
+             0, 0, 0, 0, 2, 0, 0, 0, 0,
+             0, 0, 0, 0, 0, 0, 0, 0, 0,
+             0, 0, 0, 0, 0, 0, 0, 0, 0,
+             0, 0, 0, 0, 0, 0, 0, 0, 0,
+             0, 2, 0, 0, 4, 0, 0, 2, 0,
+             0, 0, 0, 0, 2, 0, 0, 0, 0,
+             0, 0, 0, 0, 0, 0, 0, 0, 0),
+    SOLDIER: (0, 0, 0, 0, 0, 0, 0, 0, 0,
+              2, 4, 6, 10, 12, 10, 6, 4, 2,
+              2, 4, 6, 10, 10, 10, 6, 4, 2,
+              2, 3, 4, 6, 6, 6, 4, 3, 2,
+              1, 2, 3, 4, 4, 4, 3, 2, 1,
+              0, 1, 1, 2, 2, 2, 1, 1, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0, 0),
+}
+
+
+def build_square_values(code):
+    """Returns what a piece with the given code is worth on each square, counted from Blue's side: positive for a Blue
+    piece and negative for a Red one, so the value of a position is the sum over its pieces"""
+    piece_type = code & TYPE_MASK
+    if code & TEAM_MASK == BLUE and piece_type:
+        return tuple(PIECE_VALUES[piece_type] + SQUARE_TABLES[piece_type][square] for square in range(NUM_SQUARES))
+    if code & TEAM_MASK == RED and piece_type:
+        return tuple(-PIECE_VALUES[piece_type] - SQUARE_TABLES[piece_type][(ROWS - 1 - square // COLS) * COLS +
+                                                                           square % COLS]
+                     for square in range(NUM_SQUARES))
+    return (0,) * NUM_SQUARES
+
+
+# Indexed like ZOBRIST_KEYS, so a move can update the evaluation the same way it updates the position key
+SQUARE_VALUES = tuple(build_square_values(code) for code in range(TEAM_MASK + TYPE_MASK + 1))
+
+
+def compute_evaluation(squares):
+    """Receives a compact board and returns its static evaluation from Blue's side, in tenths of a point, computed from
+    scratch"""
+    evaluation = -RED_DEOM
+    for square in range(NUM_SQUARES):
+        evaluation += SQUARE_VALUES[squares[square]][square]
+    return evaluation
+
+
+def compute_position_key(squares, red_to_move):
+    """Receives a compact board and whether it is Red's turn, and returns the Zobrist key for the position, computed
+    from scratch"""
+    key = RED_TO_MOVE_KEY if red_to_move else 0
+    for square in range(NUM_SQUARES):
+        key ^= ZOBRIST_KEYS[squares[square]][square]
+    return key
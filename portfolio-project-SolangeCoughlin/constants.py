@@ -30,45 +30,6 @@ TITLE_FONT = pygame.freetype.SysFont("Courier",75)
 
 highlight = pygame.image.load('assets/highlight_block.png')
 
-# Importing game piece images and scaling to 40x40
-red_gen = pygame.image.load('assets/red_general.png')
-red_gen = pygame.transform.scale(red_gen,(scale_size,scale_size))
-
-red_sol = pygame.image.load('assets/red_soldier.png')
-red_sol = pygame.transform.scale(red_sol,(scale_size,scale_size))
-
-red_char = pygame.image.load('assets/red_chariot.png')
-red_char = pygame.transform.scale(red_char,(scale_size,scale_size))
-
-red_adv = pygame.image.load('assets/red_advisor.png')
-red_adv = pygame.transform.scale(red_adv,(scale_size,scale_size))
-
-red_can = pygame.image.load('assets/red_cannon.png')
-red_can = pygame.transform.scale(red_can,(scale_size,scale_size))
-
-red_el = pygame.image.load('assets/red_elephant.png')
-red_el = pygame.transform.scale(red_el,(scale_size,scale_size))
-
-red_horse = pygame.image.load('assets/red_horse.png')
-red_horse = pygame.transform.scale(red_horse,(scale_size,scale_size))
-
-blue_gen = pygame.image.load('assets/blue_general.png')
-blue_gen = pygame.transform.scale(blue_gen,(scale_size,scale_size))
-
-blue_sol = pygame.image.load('assets/blue_soldier.png')
-blue_sol = pygame.transform.scale(blue_sol,(scale_size,scale_size))
-
-blue_char = pygame.image.load('assets/blue_chariot.png')
-blue_char = pygame.transform.scale(blue_char,(scale_size,scale_size))
-
-blue_adv = pygame.image.load('assets/blue_advisor.png')
-blue_adv = pygame.transform.scale(blue_adv,(scale_size,scale_size))
-
-blue_can = pygame.image.load('assets/blue_cannon.png')
-blue_can = pygame.transform.scale(blue_can,(scale_size,scale_size))
-
-blue_el = pygame.image.load('assets/blue_elephant.png')
-blue_el = pygame.transform.scale(blue_el,(scale_size,scale_size))
-
-blue_horse = pygame.image.load('assets/blue_horse.png')
-blue_horse = pygame.transform.scale(blue_horse,(scale_size,scale_size))
\ No newline at end of file
+# Game piece images are loaded and scaled to scale_size x scale_size by Sprites.py the first time they are drawn
+PIECE_IMAGE_NAMES = {"General": "general", "Guard": "advisor", "Soldier": "soldier", "Chariot": "chariot",
+                     "Cannon": "cannon", "Horse": "horse", "Elephant": "elephant"}
@@ -1,7 +1,10 @@
 import pygame
 from constants import *
-from JanggiGame import *
+from JanggiGame import JanggiGame
+from board import to_square, square_to_location
 from Button import *
+from Sprites import *
+from recorder import FileRecorder
 from enum import Enum
 
 """
@@ -47,7 +50,7 @@ def draw_pieces(window,game,dict):
     """
     for piece_id in dict:
         piece = game.get_piece_from_id(piece_id)
-        piece.draw(window)
+        draw_piece(window, piece)
 
 def show_text(window,text,color):
     """
@@ -84,15 +87,19 @@ def main():
     pygame.display.set_icon(icon)
     game_state = GameState.TITLE
 
+    # Record the moves of every game played to move_list.txt
+    recorder = FileRecorder("move_list.txt")
+
     # Game loop
     while True:
         if game_state == GameState.TITLE:
             game_state = title_screen(window)
         if game_state == GameState.PLAYING:
-            game_state = play_game(window)
+            game_state = play_game(window, recorder)
         if game_state == GameState.GAME_OVER:
             game_state = end_game(window)
         if game_state == GameState.QUIT:
+            recorder.close()
             pygame.quit()
             return
 
@@ -147,12 +154,12 @@ def title_screen(window):
 
         pygame.display.update()
 
-def play_game(window):
+def play_game(window, recorder):
     """
-    Called when the game state is playing.
+    Called when the game state is playing. The moves made are passed to the recorder.
     """
 
-    Janggi = JanggiGame()
+    Janggi = JanggiGame(recorder=recorder)
     start_letters = ""
     end = ""
     draw_board(window)
@@ -184,20 +191,19 @@ def play_game(window):
                         # Change the start_letters into numbers that can be passed to the game
                         start_numbers = [pos[1],pos[0]]
 
-                        # Get the id of the piece selected
-                        piece_id = Janggi.whats_here(start_numbers)
-
                         # If the piece belongs to the player whose turn it is, continue
                         if Janggi.piece_belongs_to_turntaker(start_numbers):
 
-                            # Get the piece object, and then get the list of moves the piece can make
-                            piece = Janggi.get_piece_from_id(piece_id)
-                            moves = piece.get_move_list()
+                            # Get the legal moves the piece can make, leaving out passing and any move that would
+                            # leave the general in check
+                            start_square = to_square(start_numbers[0], start_numbers[1])
+                            moves = [square_to_location(end_square) for move_start, end_square in Janggi.legal_moves()
+                                     if move_start == start_square and end_square != start_square]
 
                             # For each move, highlight it on the board
                             for move in moves:
-                                x = piece.calc_pixel_position(move[1])
-                                y = piece.calc_pixel_position(move[0])
+                                x = calc_pixel_position(move[1])
+                                y = calc_pixel_position(move[0])
                                 new_highlight = highlight.convert_alpha()
                                 new_highlight.set_alpha(100)
                                 window.blit(new_highlight,(x+3,y+3))
@@ -0,0 +1,101 @@
+"""
+Move ordering for the search (see search.py). Alpha-beta stops searching a position as soon as one move is shown to be
+good enough, so the sooner a good move is tried, the fewer moves are searched. Legal moves come out of the rules engine
+in the fixed order each piece class looks for them, so MoveOrdering sorts them before they are searched:
+
+1. The best move stored in the transposition table for the position.
+2. Captures, most valuable victim first, and for the same victim the least valuable attacker first (MVV-LVA).
+3. The killer moves for the ply: the last two quiet moves that cut off the search at the same depth in another line.
+4. Other quiet moves, by their history score: how much searching has been cut off by moving the same piece to the same
+   square before, weighted towards deeper searches.
+
+The first-move cutoff rate, the fraction of cutoffs made by the first move searched, shows how well this works. A rate
+near 1 means the search is close to the best case, where every position that can be cut off is cut off by its first
+move.
+"""
+
+from board import *
+
+# Captures are sorted above every quiet move, and the table move above every capture
+CAPTURE_SCORE = 1 << 30
+TABLE_MOVE_SCORE = 1 << 40
+KILLER_SCORES = (CAPTURE_SCORE - 1, CAPTURE_SCORE - 2)
+
+
+def capture_score(victim_code, attacker_code):
+    """Receives the codes of a captured piece and the piece capturing it, and returns the MVV-LVA score of the capture"""
+    return CAPTURE_SCORE + PIECE_VALUES[victim_code & TYPE_MASK] * 256 - PIECE_VALUES[attacker_code & TYPE_MASK]
+
+
+class MoveOrdering:
+    """Sorts the moves of each position for the search, and keeps the killer moves, the history table and the cutoff
+    counters. Kept by a Searcher for all of its searches."""
+
+    def __init__(self, max_ply):
+        """Receives the greatest number of moves into the search a position can be"""
+        self._max_ply = max_ply
+        self._killers = [[None, None] for _ in range(max_ply + 1)]
+        # The history score of each piece code moving to each square, indexed by code * NUM_SQUARES + square
+        self._history = [0] * ((TEAM_MASK + TYPE_MASK + 1) * NUM_SQUARES)
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
+
+    def new_search(self):
+        """Forgets the killer moves and halves the history scores, so they favour the new position, and resets the
+        counters"""
+        self._killers = [[None, None] for _ in range(self._max_ply + 1)]
+        self._history = [score >> 1 for score in self._history]
+        self._cutoffs = 0
+        self._first_move_cutoffs = 0
+
+    def order(self, squares, moves, ply, table_move=None):
+        """Receives the compact board, a list of legal moves, the number of moves into the search and the table move,
+        if any, and returns the moves sorted with the most promising first"""
+        killers = self._killers[ply]
+        history = self._history
+
+        def score(move):
+            start_square, end_square = move
+            if move == table_move:
+                return TABLE_MOVE_SCORE
+            victim = squares[end_square]
+            if victim and start_square != end_square:
+                return capture_score(victim, squares[start_square])
+            if move == killers[0]:
+                return KILLER_SCORES[0]
+            if move == killers[1]:
+                return KILLER_SCORES[1]
+            return history[squares[start_square] * NUM_SQUARES + end_square]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def record_cutoff(self, squares, move, ply, depth, move_number):
+        """Receives the compact board, the move that cut off the search of a position, the number of moves into the
+        search and the depth left to search at the position, and the number of moves searched before it there. Quiet
+        moves become killers for the ply and gain history."""
+        self._cutoffs += 1
+        if move_number == 0:
+            self._first_move_cutoffs += 1
+
+        start_square, end_square = move
+        if squares[end_square] and start_square != end_square:
+            return
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self._history[squares[start_square] * NUM_SQUARES + end_square] += depth * depth
+
+    def get_killers(self, ply):
+        """Returns the two killer moves for the given ply, most recent first, or None for any not yet found"""
+        return tuple(self._killers[ply])
+
+    def get_history(self, code, square):
+        """Returns the history score for the piece with the given code moving to the given square"""
+        return self._history[code * NUM_SQUARES + square]
+
+    def get_stats(self):
+        """Returns a dictionary of counters since the last call to new_search: 'cutoffs', 'first_move_cutoffs' and
+        'first_move_cutoff_rate'"""
+        return {"cutoffs": self._cutoffs, "first_move_cutoffs": self._first_move_cutoffs,
+                "first_move_cutoff_rate": self._first_move_cutoffs / max(self._cutoffs, 1)}
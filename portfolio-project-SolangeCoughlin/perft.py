@@ -0,0 +1,219 @@
+"""
+Perft (performance test) for the Janggi move generator. perft counts the leaf nodes of the tree of legal moves to a
+given depth, which checks the move generator against known counts and times it at the same time. Run it from the
+command line with: python perft.py [depth] [--position NAME] [--divide] [--workers N] [--split PLIES]
+
+With --workers, the tree is split after the first one or two moves and the subtrees are counted in separate processes.
+The worker processes only import the rules engine (JanggiGame.py, Piece.py and board.py), never the GUI.
+
+Passing counts as a move, except while in check, since a player can't leave their general in check.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from board import *
+from JanggiGame import JanggiGame
+
+# A complete game, ending in checkmate for Blue, used by the tests and benchmarks. Its first 18 moves lead to the
+# middlegame test position.
+SAMPLE_GAME = [("c10", "d8"), ("g4", "h4"), ("i7", "h7"), ("h3", "h7"), ("g7", "h7"), ("h1", "g3"), ("i10", "i6"),
+               ("e4", "e5"), ("a7", "b7"), ("c1", "d3"), ("h10", "g8"), ("e5", "e6"), ("e7", "e6"), ("g3", "f5"),
+               ("e6", "e5"), ("d3", "e5"), ("i6", "e6"), ("c4", "b4"), ("h8", "e8"), ("b3", "b7"), ("e6", "e5"),
+               ("e2", "d3"), ("e5", "f5"), ("g1", "e4"), ("f5", "d5"), ("b1", "d4"), ("d5", "d4")]
+
+# Positions the move generator is checked against, each given as the moves that lead to it from the start, along with
+# the expected perft counts for depths 1, 2, 3...
+TEST_POSITIONS = {
+    "start": {
+        "moves": [],
+        "counts": [32, 1024, 33506, 1095844],
+    },
+    "opening": {
+        "moves": [("c7", "c6"), ("c1", "d3"), ("b10", "d7"), ("b3", "e3"), ("c10", "d8"), ("h1", "g3")],
+        "counts": [42, 1805, 69034],
+    },
+    "check": {
+        "moves": [("a7", "b7"), ("c4", "c5"), ("b8", "b5"), ("c5", "c5"), ("b5", "e5")],
+        "counts": [7, 284, 9416, 389390],
+    },
+    "middlegame": {
+        "moves": SAMPLE_GAME[:18],
+        "counts": [57, 1883, 102887],
+    },
+}
+
+
+def perft(game, depth):
+    """
+    Receives a game and a depth, and returns the number of leaf nodes in the tree of legal moves that many moves deep
+    from the current position. The game is returned to the same position afterwards.
+    """
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return sum(1 for move in game.legal_moves())
+
+    nodes = 0
+    for move in game.legal_moves():
+        game.push(move)
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def divide(game, depth):
+    """
+    Receives a game and a depth of at least 1, and returns a dictionary mapping each legal move from the current
+    position to the perft count of the position after it, so a wrong total can be traced to the move responsible
+    """
+    counts = {}
+    for move in game.legal_moves():
+        game.push(move)
+        counts[move] = perft(game, depth - 1)
+        game.pop()
+    return counts
+
+
+# The game a worker process counts subtrees of, set up once when the worker starts
+_worker_game = None
+
+
+def _start_worker(game):
+    """Receives the game to count from, and keeps it for the subtrees this worker process is given"""
+    global _worker_game
+    _worker_game = game
+
+
+def _count_subtree(task):
+    """
+    Receives a task (moves, depth), makes the moves in the worker's game and returns the perft count to the remaining
+    depth below them. Takes the moves back again so the next task starts from the same position.
+    """
+    moves, depth = task
+    for move in moves:
+        _worker_game.push(move)
+    nodes = perft(_worker_game, depth)
+    for _ in moves:
+        _worker_game.pop()
+    return nodes
+
+
+def split_tree(game, plies):
+    """
+    Receives a game and a number of plies, and returns a list of every legal sequence of that many moves from the
+    current position, as tuples of moves. A sequence that reaches a position with no legal moves before it is that long
+    is left out, which doesn't change any count, since it has no leaf nodes at the full depth.
+    """
+    if plies == 0:
+        return [()]
+    sequences = []
+    for move in game.legal_moves():
+        game.push(move)
+        sequences.extend((move,) + sequence for sequence in split_tree(game, plies - 1))
+        game.pop()
+    return sequences
+
+
+def parallel_divide(game, depth, workers=None, split_plies=1):
+    """
+    Receives a game, a depth of at least 1, the number of worker processes to use (or None for one per CPU) and the
+    number of plies to split the tree after. Counts the subtrees below each sequence of split_plies moves in the worker
+    processes, and returns the same dictionary as divide: the count below each root move.
+    """
+    split_plies = max(1, min(split_plies, depth))
+    sequences = split_tree(game, split_plies)
+    tasks = [(sequence, depth - len(sequence)) for sequence in sequences]
+
+    # Hand out the tasks in chunks, a few per worker, so they are shared out evenly without one message per task
+    chunk_size = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+    counts = {move: 0 for move in game.legal_moves()}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker, initargs=(game,)) as executor:
+        for sequence, nodes in zip(sequences, executor.map(_count_subtree, tasks, chunksize=chunk_size)):
+            counts[sequence[0]] += nodes
+    return counts
+
+
+def parallel_perft(game, depth, workers=None, split_plies=1):
+    """
+    Receives a game, a depth, the number of worker processes to use (or None for one per CPU) and the number of plies
+    to split the tree after, and returns the same count as perft, computed in parallel
+    """
+    if depth == 0:
+        return 1
+    return sum(parallel_divide(game, depth, workers, split_plies).values())
+
+
+def move_name(move):
+    """Receives a move as a tuple of squares and returns it in algebraic notation, such as c7c6"""
+    return square_name(move[0]) + square_name(move[1])
+
+
+def load_position(name):
+    """Receives the name of one of the TEST_POSITIONS and returns a new game set up in that position"""
+    game = JanggiGame()
+    for start_pos, end_pos in TEST_POSITIONS[name]["moves"]:
+        if not game.make_move(start_pos, end_pos):
+            raise ValueError("illegal move %s-%s in test position %s" % (start_pos, end_pos, name))
+    return game
+
+
+def run_position(name, depth, show_divide, workers=1, split_plies=1):
+    """
+    Runs perft on one of the TEST_POSITIONS to the given depth, prints the node count and speed, and compares the count
+    with the expected one if it is known. Uses worker processes if workers is not 1 (None for one per CPU). Returns
+    False if the count is wrong, and True otherwise.
+    """
+    game = load_position(name)
+    start = time.perf_counter()
+    if workers != 1 and depth > 1:
+        counts = parallel_divide(game, depth, workers, split_plies)
+    elif show_divide:
+        counts = divide(game, depth)
+    else:
+        counts = {None: perft(game, depth)}
+    if show_divide:
+        for move in sorted(counts, key=move_name):
+            print("  %s: %d" % (move_name(move), counts[move]))
+    nodes = sum(counts.values())
+    elapsed = time.perf_counter() - start
+
+    expected_counts = TEST_POSITIONS[name]["counts"]
+    correct = True
+    if depth > len(expected_counts):
+        result = "no reference count"
+    elif nodes == expected_counts[depth - 1]:
+        result = "ok"
+    else:
+        result = "MISMATCH, expected %d" % expected_counts[depth - 1]
+        correct = False
+    print("%-12s depth %d: %10d nodes in %8.3f s, %8.0f nodes/s (%s)" % (name, depth, nodes, elapsed,
+                                                                        nodes / max(elapsed, 1e-9), result))
+    return correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft for the Janggi move generator")
+    parser.add_argument("depth", type=int, nargs="?", default=3)
+    parser.add_argument("--position", choices=sorted(TEST_POSITIONS) + ["all"], default="all",
+                        help="the test position to count from (default: all of them)")
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes to count with (0 for one per CPU, default: 1)")
+    parser.add_argument("--split", type=int, choices=(1, 2), default=1,
+                        help="number of plies to split the tree after when using workers (default: 1)")
+    args = parser.parse_args()
+    workers = args.workers or None
+
+    names = sorted(TEST_POSITIONS) if args.position == "all" else [args.position]
+    failed = False
+    for name in names:
+        if not run_position(name, args.depth, args.divide, workers, args.split):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
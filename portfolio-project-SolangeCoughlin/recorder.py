@@ -0,0 +1,148 @@
+"""
+Game recorders for the Janggi rules engine. A JanggiGame is given a recorder when it is created, and tells it about each
+move made with make_move, and the result when the game ends. Every record carries the ID of the game it belongs to, so
+many games can share one recorder.
+
+Recorder         records nothing (the default)
+MemoryRecorder   keeps the moves and results in memory
+FileRecorder     writes them to a file per game, or to one shared file or stream, in the background
+
+Records are written as lines of text: "<game ID> <start>-><end>" for each move (a pass has the same start and end), and
+"<game ID> <result>" when the game ends, where the result is 'BLUE_WON' or 'RED_WON'.
+"""
+
+import queue
+import threading
+from urllib.parse import quote
+
+
+class Recorder():
+    """A recorder that records nothing. Other recorders inherit from this and override the methods they need."""
+
+    def record_move(self, game_id, start_pos, end_pos):
+        """Receives a game ID and the start and end positions of a move made in that game, in algebraic notation"""
+        pass
+
+    def end_game(self, game_id, result):
+        """Receives a game ID and the state the game ended in"""
+        pass
+
+    def close(self):
+        """Finishes writing anything that is still buffered. The recorder can't be used after it is closed."""
+        pass
+
+
+class MemoryRecorder(Recorder):
+    """Keeps the moves and results of every game in memory, which is useful for tests and for handing games to other
+    code without going through a file"""
+
+    def __init__(self):
+        """Initializes the recorder with no games"""
+        self._moves = {}
+        self._results = {}
+
+    def record_move(self, game_id, start_pos, end_pos):
+        """Adds the move to the list of moves for the game"""
+        self._moves.setdefault(game_id, []).append((start_pos, end_pos))
+
+    def end_game(self, game_id, result):
+        """Remembers the result of the game"""
+        self._results[game_id] = result
+
+    def get_game_ids(self):
+        """Returns a list of the IDs of the games that have recorded moves, in the order they were first seen"""
+        return list(self._moves)
+
+    def get_moves(self, game_id):
+        """Returns the list of (start, end) moves recorded for the game"""
+        return self._moves.get(game_id, [])
+
+    def get_result(self, game_id):
+        """Returns the result of the game, or 'UNFINISHED' if it hasn't ended"""
+        return self._results.get(game_id, "UNFINISHED")
+
+
+class FileRecorder(Recorder):
+    """
+    Writes the records to files or a stream without slowing down the games. Records are buffered for each game, and the
+    buffer is handed to a background thread to write when the game ends or when flush_every moves have built up.
+
+    The destination is either an open text stream, which all games are written to, or a file path. If the path contains
+    "{game_id}", each game is written to its own file, such as "games/{game_id}.txt". The game ID is escaped the way
+    URLs are, dots included, so an ID such as "../x" or "a/b" can't name a file outside the directory, and different
+    IDs always get different files. Files are opened in append mode.
+
+    An error in the background thread, such as a full disk, doesn't stop it writing the games after it, and is raised
+    from the next call to flush or close.
+    """
+
+    def __init__(self, destination, flush_every=64):
+        """Initializes the recorder to write to the given destination, and starts the background writer thread"""
+        self._destination = destination
+        self._flush_every = flush_every
+        self._buffers = {}
+        self._error = None
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_records, daemon=True)
+        self._writer.start()
+
+    def record_move(self, game_id, start_pos, end_pos):
+        """Adds the move to the game's buffer, and hands the buffer to the writer once it is full"""
+        buffer = self._buffers.setdefault(game_id, [])
+        buffer.append("%s %s->%s\n" % (game_id, start_pos, end_pos))
+        if len(buffer) >= self._flush_every:
+            self._hand_over(game_id)
+
+    def end_game(self, game_id, result):
+        """Adds the result to the game's buffer and hands everything left in it to the writer"""
+        self._buffers.setdefault(game_id, []).append("%s %s\n" % (game_id, result))
+        self._hand_over(game_id)
+
+    def flush(self, game_id=None):
+        """Hands the buffered records for a game, or for every game if no game ID is given, to the writer. Raises the
+        first error the writer has run into since the last one was raised, if any."""
+        self._hand_over(game_id)
+        self._raise_writer_error()
+
+    def close(self):
+        """Writes everything that is still buffered and waits for the writer to finish. Raises the first error the
+        writer ran into since the last one was raised, if any, once it has finished."""
+        self._hand_over(None)
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_writer_error()
+
+    def _hand_over(self, game_id):
+        """Hands the buffered records for a game, or for every game if the game ID is None, to the writer"""
+        game_ids = [game_id] if game_id is not None else list(self._buffers)
+        for this_id in game_ids:
+            buffer = self._buffers.pop(this_id, None)
+            if buffer:
+                self._queue.put((this_id, "".join(buffer)))
+
+    def _raise_writer_error(self):
+        """Raises the error the writer thread kept, if there is one, and forgets it so it is only raised once"""
+        error = self._error
+        if error is not None:
+            self._error = None
+            raise error
+
+    def _write_records(self):
+        """Runs in the writer thread: writes each batch of records it is handed until the recorder is closed"""
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            game_id, text = batch
+            try:
+                if isinstance(self._destination, str):
+                    file_id = quote(game_id, safe="").replace(".", "%2E")
+                    with open(self._destination.replace("{game_id}", file_id), "a") as outfile:
+                        outfile.write(text)
+                else:
+                    self._destination.write(text)
+                    self._destination.flush()
+            except Exception as error:
+                # Keep the first error for flush or close to raise, and carry on with the other games
+                if self._error is None:
+                    self._error = error
@@ -0,0 +1,315 @@
+"""
+A computer opponent for the Janggi rules engine: a negamax alpha-beta search with iterative deepening. The search looks
+one move deeper at a time until it runs out of time or nodes, or reaches the depth it was asked for, and plays the best
+move of the deepest search it finished. Run it from the command line with:
+python search.py [--position NAME] [--time SECONDS] [--depth N] [--nodes N] [--hash MB]
+
+Scores are from the point of view of the player to move, in tenths of a point. Positions at the end of the search are
+searched on through their captures only (the quiescence search), so a position is never scored partway through an
+exchange, and then scored with JanggiGame.evaluate, which is kept up to date as moves are made and taken back. A
+checkmate scores MATE_SCORE less the number of moves it takes, so quicker mates score higher.
+
+Positions already searched are looked up in a transposition table (see transposition.py), which is kept between calls
+to best_move on the same Searcher. The moves of each position are sorted before they are searched, starting with the
+best move stored in the table for the position (see ordering.py).
+"""
+
+import argparse
+import time
+from board import *
+from ordering import MoveOrdering
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+MATE_SCORE = 100000
+# Scores further from 0 than this are checkmates
+MATE_BOUND = MATE_SCORE - 1000
+MAX_PLY = 100
+
+# The clock and the node budget are checked every this many nodes
+CHECK_INTERVAL = 64
+
+# How much a capture is allowed to gain on top of the value of the piece captured, from the square it lands on, before
+# the quiescence search decides it can't be worth searching (see Searcher.quiescence)
+DELTA_MARGIN = 20
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when it runs out of time or nodes, to unwind back to best_move"""
+
+
+def score_to_table(score, ply):
+    """Receives a score found ply moves into the search, and returns it as stored in the transposition table. Mate
+    scores count the moves from the root, so they are stored counting from the position instead."""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """Receives a score from the transposition table for a position ply moves into the search, and returns it counting
+    mates from the root again"""
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def move_name(move):
+    """Receives a move as a tuple of squares and returns it in algebraic notation, such as c7-c6"""
+    return square_name(move[0]) + "-" + square_name(move[1])
+
+
+class Searcher:
+    """
+    Searches a game for the best move. The search works on the game itself with push and pop, and leaves it in the
+    position it started from.
+    """
+
+    def __init__(self, table_mb=16):
+        """Receives the memory budget for the transposition table, in megabytes"""
+        self._table = TranspositionTable(table_mb)
+        self._ordering = MoveOrdering(MAX_PLY)
+        self._nodes = 0
+        self._quiescence_nodes = 0
+        self._deadline = None
+        self._max_nodes = None
+        # _pv[ply] holds the best line found from the position ply moves into the search
+        self._pv = [[] for _ in range(MAX_PLY + 1)]
+
+    def best_move(self, game, time_limit=None, depth=None, max_nodes=None, start_time=None):
+        """
+        Receives a game and the limits to search it within: a time limit in seconds, a depth in moves, and a number of
+        nodes. With no limits at all, searches to a depth of 4. The time limit counts from start_time, a reading of
+        time.perf_counter taken by the caller, if given, so time spent getting ready for the search counts against it.
+        Returns a dictionary with the best move found ('move', a tuple of squares, or None if the player has no legal
+        move), its 'score', the principal variation ('pv', the list of moves both players are expected to make), the
+        'depth' of the deepest search finished, the 'nodes' searched, how many of them were in the quiescence search
+        ('quiescence_nodes'), the 'seconds' taken, nodes per second ('nps'), a list of the same figures for each depth
+        ('iterations'), the transposition table statistics ('table', see TranspositionTable.get_stats), and the move
+        ordering counters ('ordering', see MoveOrdering.get_stats).
+
+        A search that runs out of time or nodes part way through a depth is cut short, and the move is taken from the
+        deepest search that finished. The first depth is always finished, so there is always a move to play.
+        """
+        if time_limit is None and depth is None and max_nodes is None:
+            depth = 4
+        start = time.perf_counter() if start_time is None else start_time
+        self._nodes = 0
+        self._quiescence_nodes = 0
+        self._deadline = None if time_limit is None else start + time_limit
+        self._max_nodes = max_nodes
+        self._table.new_search()
+        self._ordering.new_search()
+
+        result = {"move": None, "score": 0, "pv": [], "depth": 0, "nodes": 0, "quiescence_nodes": 0, "seconds": 0.0,
+                  "nps": 0.0, "iterations": [], "table": None, "ordering": None}
+        root_moves = self._ordering.order(game.get_squares(), list(game.legal_moves()), 0)
+        if not root_moves:
+            result["score"] = -MATE_SCORE if game.get_game_state() == "UNFINISHED" else 0
+            return result
+
+        current_depth = 1
+        while depth is None or current_depth <= depth:
+            try:
+                score = self.search_root(game, root_moves, current_depth, must_finish=current_depth == 1)
+            except SearchStopped:
+                break
+            pv = list(self._pv[0])
+            elapsed = time.perf_counter() - start
+            result.update(move=pv[0], score=score, pv=pv, depth=current_depth)
+            result["iterations"].append({"depth": current_depth, "score": score, "pv": pv, "nodes": self._nodes,
+                                         "seconds": elapsed})
+
+            # Search the best move first next time, and stop once a forced mate has been found
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+            if abs(score) > MATE_BOUND or current_depth >= MAX_PLY:
+                break
+            current_depth += 1
+
+        result["nodes"] = self._nodes
+        result["quiescence_nodes"] = self._quiescence_nodes
+        result["seconds"] = elapsed = time.perf_counter() - start
+        result["nps"] = self._nodes / max(elapsed, 1e-9)
+        result["table"] = self._table.get_stats()
+        result["ordering"] = self._ordering.get_stats()
+        return result
+
+    def search_root(self, game, root_moves, depth, must_finish=False):
+        """
+        Receives a game, its legal moves and a depth, and searches each move to that depth. Returns the best score, and
+        leaves the principal variation in _pv[0]. Unless must_finish is True, raises SearchStopped if the search runs
+        out of time or nodes.
+        """
+        alpha = -MATE_SCORE - 1
+        for move in root_moves:
+            game.push(move)
+            try:
+                score = -self.negamax(game, depth - 1, -MATE_SCORE - 1, -alpha, 1, must_finish)
+            finally:
+                game.pop()
+            if score > alpha:
+                alpha = score
+                self._pv[0] = [move] + self._pv[1]
+        self._table.store(game.position_key(), depth, EXACT, alpha, self._pv[0][0])
+        return alpha
+
+    def negamax(self, game, depth, alpha, beta, ply, must_finish=False):
+        """
+        Receives a game, the depth left to search, the window of scores (alpha, beta) that matter to the moves above,
+        and the number of moves made since the root. Returns the score of the position for the player to move, which
+        is exact if it falls inside the window, and otherwise only says which side of the window it is on.
+        """
+        self._nodes += 1
+        if not must_finish and self._nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        self._pv[ply] = []
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(game, alpha, beta, ply, must_finish)
+
+        # Use what the table knows about the position: a score, if it was searched deep enough, and a move to try first
+        key = game.position_key()
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, bound, score, table_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER_BOUND and score >= beta) or (
+                        bound == UPPER_BOUND and score <= alpha):
+                    if bound == EXACT and table_move is not None:
+                        self._pv[ply] = [table_move]
+                    return score
+
+        moves = list(game.legal_moves())
+        # A player with no legal move is checkmated, since passing is allowed unless in check
+        if not moves:
+            return -MATE_SCORE + ply
+        squares = game.get_squares()
+        moves = self._ordering.order(squares, moves, ply, table_move)
+
+        original_alpha = alpha
+        best_move = None
+        for move_number, move in enumerate(moves):
+            game.push(move)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1, must_finish)
+            finally:
+                game.pop()
+            if score > alpha:
+                alpha = score
+                best_move = move
+                if alpha >= beta:
+                    self._ordering.record_cutoff(squares, move, ply, depth, move_number)
+                    break
+                self._pv[ply] = [move] + self._pv[ply + 1]
+
+        if alpha >= beta:
+            bound = LOWER_BOUND
+        elif alpha > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self._table.store(key, depth, bound, score_to_table(alpha, ply), best_move)
+        return alpha
+
+    def quiescence(self, game, alpha, beta, ply, must_finish=False):
+        """
+        Receives the same arguments as negamax, for a position at the end of the main search, and returns its score
+        once the captures have played out, so a position isn't scored in the middle of an exchange. Only captures are
+        searched (see JanggiGame.legal_captures), and the player to move can "stand pat" on the static evaluation
+        instead of capturing, unless they are in check, when every legal move is searched.
+        """
+        self._nodes += 1
+        self._quiescence_nodes += 1
+        if not must_finish and self._nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+        self._pv[ply] = []
+        if ply >= MAX_PLY:
+            return game.evaluate()
+
+        squares = game.get_squares()
+        if game.is_in_check(game.get_current_turn()):
+            moves = list(game.legal_moves())
+            if not moves:
+                return -MATE_SCORE + ply
+            stand_pat = None
+        else:
+            stand_pat = game.evaluate()
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            moves = list(game.legal_captures())
+
+        for move in self._ordering.order(squares, moves, ply):
+            # Delta pruning: skip a capture that couldn't raise the score to alpha even if the piece were free
+            if stand_pat is not None and stand_pat + PIECE_VALUES[squares[move[1]] & TYPE_MASK] + DELTA_MARGIN <= alpha:
+                continue
+            game.push(move)
+            try:
+                score = -self.quiescence(game, -beta, -alpha, ply + 1, must_finish)
+            finally:
+                game.pop()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def check_limits(self):
+        """Raises SearchStopped if the search has run out of time or nodes"""
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchStopped()
+        if self._max_nodes is not None and self._nodes >= self._max_nodes:
+            raise SearchStopped()
+
+
+def best_move(game, time_limit=None, depth=None, max_nodes=None, table_mb=16, searcher=None):
+    """Receives a game, the limits to search it within, the memory budget for the transposition table and a Searcher,
+    and returns the result of searching it with the Searcher (see Searcher.best_move). Pass the same Searcher for each
+    move of a game to keep its transposition table. With no Searcher, a new one is made with a table of table_mb
+    megabytes, and the time taken to make it counts against the time limit."""
+    start_time = time.perf_counter()
+    if searcher is None:
+        searcher = Searcher(table_mb)
+    return searcher.best_move(game, time_limit, depth, max_nodes, start_time)
+
+
+def main():
+    from perft import TEST_POSITIONS, load_position
+
+    parser = argparse.ArgumentParser(description="Search a Janggi position for the best move")
+    parser.add_argument("--position", choices=sorted(TEST_POSITIONS), default="start",
+                        help="position to search (default: start)")
+    parser.add_argument("--time", type=float, help="time limit in seconds")
+    parser.add_argument("--depth", type=int, help="depth limit in moves")
+    parser.add_argument("--nodes", type=int, help="node limit")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB (default: 16)")
+    args = parser.parse_args()
+
+    result = best_move(load_position(args.position), args.time, args.depth, args.nodes, args.hash)
+    for iteration in result["iterations"]:
+        print("depth %2d  score %6d  nodes %9d  %8.3f s  pv %s" % (
+            iteration["depth"], iteration["score"], iteration["nodes"], iteration["seconds"],
+            " ".join(move_name(move) for move in iteration["pv"])))
+    if result["move"] is None:
+        print("no legal move")
+    else:
+        print("best move %s, depth %d, %d nodes in %.3f s, %.0f nodes/s" % (
+            move_name(result["move"]), result["depth"], result["nodes"], result["seconds"], result["nps"]))
+        print("quiescence search: %d of the nodes" % result["quiescence_nodes"])
+        table = result["table"]
+        print("transposition table: %d probes, %.1f%% hits, %d stores, %d overwrites" % (
+            table["probes"], 100 * table["hit_rate"], table["stores"], table["overwrites"]))
+        ordering = result["ordering"]
+        print("move ordering: %d cutoffs, %.1f%% by the first move" % (
+            ordering["cutoffs"], 100 * ordering["first_move_cutoff_rate"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Self-play for the Janggi rules engine. Plays games between two move-choice policies in worker processes, and writes a
+summary of the game lengths, results and speed to a JSON file. It is used as a soak test of the rules code, since every
+move a policy picks from legal_moves must also be accepted by make_move, and as a throughput benchmark. Run it from the
+command line with: python selfplay.py [games] [--blue POLICY] [--red POLICY] [--seed N] [--workers N] [--summary FILE]
+
+The policies are:
+
+random      a random legal move
+first       the first legal move the game generates
+greedy      the move that leaves the best evaluation one move ahead, with ties broken at random
+alphabeta   the move an alpha-beta search two moves deep picks (see search.py)
+
+Each game is seeded with the base seed plus the game's number, so any game can be played again on its own.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from board import *
+from JanggiGame import JanggiGame
+
+
+def random_policy(game, rng):
+    """Receives a game and a random number generator, and returns a random legal move"""
+    moves = list(game.legal_moves())
+    return rng.choice(moves) if moves else None
+
+
+def first_legal_policy(game, rng):
+    """Receives a game and a random number generator, and returns the first legal move the game generates"""
+    return next(game.legal_moves(), None)
+
+
+def greedy_policy(game, rng):
+    """
+    Receives a game and a random number generator, and returns the legal move that leaves the player with the best
+    evaluation (see JanggiGame.evaluate), looking one move ahead. A move that wins the game is always picked, and ties
+    are broken at random.
+    """
+    best_moves = []
+    best_score = None
+    for move in game.legal_moves():
+        game.push(move)
+        if game.is_in_check(game.get_current_turn()) and not game.has_legal_move():
+            game.pop()
+            return move
+        score = -game.evaluate() # The evaluation is from the side of the player to move next
+        game.pop()
+        if best_score is None or score > best_score:
+            best_moves = [move]
+            best_score = score
+        elif score == best_score:
+            best_moves.append(move)
+    return rng.choice(best_moves) if best_moves else None
+
+
+def alphabeta_policy(game, rng):
+    """Receives a game and a random number generator, and returns the move an alpha-beta search two moves deep picks
+    (see JanggiGame.best_move). The search keeps its transposition table from one move of the game to the next, and
+    each game has its own, and since the search is limited by depth rather than time, games can be played again
+    exactly."""
+    return game.best_move(depth=2)["move"]
+
+
+POLICIES = {
+    "random": random_policy,
+    "first": first_legal_policy,
+    "greedy": greedy_policy,
+    "alphabeta": alphabeta_policy,
+}
+
+
+def play_game(task):
+    """
+    Receives a task (game number, seed, Blue's policy name, Red's policy name, maximum number of moves) and plays the
+    game with make_move until it ends or reaches the maximum number of moves. Returns a dictionary with the game's
+    number, seed, result, number of moves, seconds taken and number of moves make_move rejected (which should be 0).
+    """
+    number, seed, blue_policy, red_policy, max_moves = task
+    rng = random.Random(seed)
+    policies = {"Blue": POLICIES[blue_policy], "Red": POLICIES[red_policy]}
+    game = JanggiGame(game_id="selfplay-%d" % number)
+
+    moves = 0
+    rejected = 0
+    start = time.perf_counter()
+    while game.get_game_state() == "UNFINISHED" and moves < max_moves:
+        move = policies[game.get_current_turn()](game, rng)
+        if move is None:
+            break
+        if not game.make_move(square_name(move[0]), square_name(move[1])):
+            rejected += 1
+            break
+        moves += 1
+    seconds = time.perf_counter() - start
+
+    return {"game": number, "seed": seed, "result": game.get_game_state(), "moves": moves, "seconds": seconds,
+            "rejected": rejected}
+
+
+def run_games(games, blue_policy, red_policy, seed=0, max_moves=200, workers=None):
+    """
+    Receives the number of games to play, the names of the policies for Blue and Red, the base seed, the maximum number
+    of moves per game and the number of worker processes to use (None for one per CPU, 1 for none). Plays the games and
+    returns a summary dictionary.
+    """
+    tasks = [(number, seed + number, blue_policy, red_policy, max_moves) for number in range(games)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = [play_game(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(play_game, tasks, chunksize=max(1, games // 32)))
+    wall_seconds = time.perf_counter() - start
+    return summarize(results, blue_policy, red_policy, seed, max_moves, wall_seconds)
+
+
+def summarize(results, blue_policy, red_policy, seed, max_moves, wall_seconds):
+    """Receives the results of play_game and the settings they were played with, and returns a summary dictionary"""
+    lengths = [result["moves"] for result in results]
+    total_moves = sum(lengths)
+    game_seconds = sum(result["seconds"] for result in results)
+    outcomes = {"BLUE_WON": 0, "RED_WON": 0, "UNFINISHED": 0}
+    for result in results:
+        outcomes[result["result"]] += 1
+
+    return {
+        "blue_policy": blue_policy,
+        "red_policy": red_policy,
+        "seed": seed,
+        "max_moves": max_moves,
+        "games": len(results),
+        "results": outcomes,
+        "rejected_moves": sum(result["rejected"] for result in results),
+        "game_length": {
+            "min": min(lengths, default=0),
+            "mean": statistics.fmean(lengths) if lengths else 0,
+            "median": statistics.median(lengths) if lengths else 0,
+            "max": max(lengths, default=0),
+        },
+        "total_moves": total_moves,
+        "seconds_per_move": game_seconds / total_moves if total_moves else 0,
+        "moves_per_second": total_moves / max(wall_seconds, 1e-9),
+        "wall_seconds": wall_seconds,
+        "games_played": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play games on the Janggi rules engine")
+    parser.add_argument("games", type=int, nargs="?", default=100)
+    parser.add_argument("--blue", choices=sorted(POLICIES), default="random",
+                        help="Blue's policy (default: random): greedy looks one move ahead, alphabeta searches two")
+    parser.add_argument("--red", choices=sorted(POLICIES), default="random",
+                        help="Red's policy (default: random): greedy looks one move ahead, alphabeta searches two")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game (default: 0)")
+    parser.add_argument("--max-moves", type=int, default=200,
+                        help="moves after which a game is stopped as unfinished (default: 200)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of worker processes (0 for one per CPU, the default; 1 for none)")
+    parser.add_argument("--summary", default="selfplay_summary.json",
+                        help="file the summary is written to (default: selfplay_summary.json)")
+    args = parser.parse_args()
+
+    summary = run_games(args.games, args.blue, args.red, args.seed, args.max_moves, args.workers or None)
+    with open(args.summary, "w") as outfile:
+        json.dump(summary, outfile, indent=2)
+
+    print("%d games, %s vs %s: %s" % (summary["games"], args.blue, args.red, summary["results"]))
+    print("%d moves in %.3f s: %.0f moves/s, %.3f ms per move, mean game length %.1f" % (
+        summary["total_moves"], summary["wall_seconds"], summary["moves_per_second"],
+        1000 * summary["seconds_per_move"], summary["game_length"]["mean"]))
+    if summary["rejected_moves"]:
+        print("make_move rejected %d legal moves" % summary["rejected_moves"])
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+A transposition table for the search (see search.py): a fixed-size cache of search results keyed by position key, so a
+position reached again by a different order of moves doesn't have to be searched again. The table lives in a few flat
+arrays allocated once, sized to a memory budget, rather than in a dictionary of objects that grows with the search.
+
+The entries are grouped in buckets of two, chosen by the low bits of the position key. The first entry in a bucket is
+kept for the deepest search of any position that lands there, and is only replaced by a search at least as deep, or by
+any search once it is left over from an earlier call to best_move. The second entry always takes the latest search that
+doesn't go in the first, so recent positions are found even when the first entry is holding on to an older, deeper one.
+"""
+
+from array import array
+from board import NUM_SQUARES
+
+# Bound types. A score is exact, or only a lower or upper bound when the search was cut off outside its window.
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+
+# Stored in place of a move when the search didn't find a best move
+NO_MOVE = 0xFFFF
+
+# Bytes per entry: the key (8), score (4), move (2), depth (1), and the bound type and generation packed together (1)
+ENTRY_BYTES = 16
+GENERATIONS = 64
+
+
+class TranspositionTable:
+    """A fixed-size table of search results, taking size_mb megabytes (rounded down to a power of two entries)"""
+
+    def __init__(self, size_mb=16):
+        """Receives the memory budget for the table in megabytes. The table takes the largest power of two entries that
+        fits in the budget, and always has at least one bucket."""
+        buckets = 1
+        while buckets * 4 * ENTRY_BYTES <= size_mb * 2 ** 20:
+            buckets *= 2
+        self._bucket_mask = buckets - 1
+        entries = 2 * buckets
+
+        self._keys = array("Q", bytes(8 * entries))
+        self._scores = array("i", bytes(4 * entries))
+        self._moves = array("H", bytes(2 * entries))
+        self._depths = bytearray(entries)
+        # Bound type in the low two bits (0 for an empty entry), generation above them
+        self._flags = bytearray(entries)
+        self._generation = 0
+
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+        self._overwrites = 0
+
+    def new_search(self):
+        """Starts a new generation, so entries from earlier searches give way to new ones, and resets the statistics"""
+        self._generation = (self._generation + 1) % GENERATIONS
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+        self._overwrites = 0
+
+    def clear(self):
+        """Empties the table"""
+        self._keys = array("Q", bytes(len(self._keys) * 8))
+        self._flags = bytearray(len(self._flags))
+
+    def probe(self, key):
+        """Receives a position key, and returns the entry stored for it as a tuple (depth, bound type, score, move), with
+        the move as a tuple of squares or None, or returns None if there is no entry for the position"""
+        self._probes += 1
+        index = (key & self._bucket_mask) << 1
+        if self._keys[index] != key or not self._flags[index] & 3:
+            index += 1
+            if self._keys[index] != key or not self._flags[index] & 3:
+                return None
+        self._hits += 1
+        move = self._moves[index]
+        return (self._depths[index], self._flags[index] & 3, self._scores[index],
+                None if move == NO_MOVE else divmod(move, NUM_SQUARES))
+
+    def store(self, key, depth, bound, score, move):
+        """Receives a position key, the depth searched, the bound type, the score and the best move (a tuple of squares
+        or None), and stores them in the position's bucket"""
+        self._stores += 1
+        index = (key & self._bucket_mask) << 1
+        flags = self._flags[index]
+        if (self._keys[index] != key and flags & 3 and flags >> 2 == self._generation and
+                depth < self._depths[index]):
+            # The first entry holds a deeper search from this generation, so the second entry takes this one
+            index += 1
+            flags = self._flags[index]
+        if flags & 3 and self._keys[index] != key:
+            self._overwrites += 1
+
+        self._keys[index] = key
+        self._depths[index] = min(depth, 255)
+        self._flags[index] = bound | self._generation << 2
+        self._scores[index] = score
+        self._moves[index] = NO_MOVE if move is None else move[0] * NUM_SQUARES + move[1]
+
+    def get_size(self):
+        """Returns the number of entries the table has room for"""
+        return len(self._keys)
+
+    def get_stats(self):
+        """Returns a dictionary of statistics since the last call to new_search: 'probes', 'hits', 'hit_rate', 'stores',
+        'overwrites' (stores that pushed out another position), and 'filled', the fraction of entries in use, estimated
+        from the first few thousand"""
+        filled = sum(1 for flags in self._flags[:2048] if flags & 3) / min(len(self._flags), 2048)
+        return {"probes": self._probes, "hits": self._hits, "hit_rate": self._hits / max(self._probes, 1),
+                "stores": self._stores, "overwrites": self._overwrites, "filled": filled}
@@ -0,0 +1,139 @@
+"""
+Batch validation of recorded games against the rules engine. Every game is replayed through JanggiGame.make_move, and
+any move the engine rejects is reported, along with any game whose final state differs from the result it was recorded
+with. Run it from the command line with: python validate.py FILE [FILE ...] [--workers N] [--batch-size N]
+
+Each file is either a game archive (see archive.py) or a text game record, such as move_list.txt. Games are read from
+the files as they are needed and handed to the worker processes in batches, with only a few batches waiting at a time,
+so finished games don't build up in memory. A text record's games are only read out once they end, though, so every game
+still unfinished at the point reached in it is held in memory, and those that never end are held to the end of the file
+(see archive.read_text_records).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from archive import MAGIC, ArchiveReader, read_text_records
+from JanggiGame import JanggiGame
+
+
+def read_games(paths):
+    """
+    Receives a list of file paths, and yields the games in each file, one at a time, as (game ID, moves, result) tuples
+    with moves as a list of (start, end) tuples in algebraic notation
+    """
+    for path in paths:
+        with open(path, "rb") as infile:
+            is_archive = infile.read(len(MAGIC)) == MAGIC
+        if is_archive:
+            with ArchiveReader(path) as reader:
+                for archived_game in reader:
+                    yield archived_game.get_game_id(), archived_game.get_move_names(), archived_game.get_result()
+        else:
+            with open(path) as infile:
+                yield from read_text_records(infile)
+
+
+def validate_game(game_id, moves, result):
+    """
+    Receives a game ID, the game's moves as (start, end) tuples and the result it was recorded with, and replays the
+    moves through JanggiGame.make_move. Returns a tuple (game ID, number of moves made, the first illegal move as a tuple
+    (index, start, end) or None, final game state, recorded result). The replay stops at the first illegal move.
+    """
+    game = JanggiGame(game_id=game_id)
+    for index, (start_pos, end_pos) in enumerate(moves):
+        if not game.make_move(start_pos, end_pos):
+            return game_id, index, (index, start_pos, end_pos), game.get_game_state(), result
+    return game_id, len(moves), None, game.get_game_state(), result
+
+
+def validate_batch(batch):
+    """Receives a list of games as (game ID, moves, result) tuples and returns the list of their validate_game results"""
+    return [validate_game(game_id, moves, result) for game_id, moves, result in batch]
+
+
+def read_batches(games, batch_size):
+    """Receives an iterator of games and a batch size, and yields the games in lists of up to batch_size games"""
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_batches(batches, workers):
+    """
+    Receives an iterator of batches of games and the number of worker processes to use (None for one per CPU), and
+    yields the validate_batch results as each batch finishes, in no particular order. A batch is only read once a slot
+    is free, so at most two batches per worker are waiting or being validated at any time. With one worker, the batches
+    are validated in this process instead.
+    """
+    if workers == 1:
+        for batch in batches:
+            yield validate_batch(batch)
+        return
+
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for batch in batches:
+            pending.add(executor.submit(validate_batch, batch))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def validate_files(paths, workers=None, batch_size=64, output=sys.stdout):
+    """
+    Receives a list of file paths, the number of worker processes to use (None for one per CPU, 1 for none) and the
+    number of games to hand a worker at a time. Validates every game in the files, writes a line to output for each
+    game with a problem and a summary at the end, and returns a dictionary of totals: 'games', 'moves', 'illegal',
+    'mismatched', 'states' (a dictionary counting the final game states) and 'seconds'.
+    """
+    totals = {"games": 0, "moves": 0, "illegal": 0, "mismatched": 0, "states": {}}
+    start = time.perf_counter()
+    for results in run_batches(read_batches(read_games(paths), batch_size), workers):
+        for game_id, move_count, illegal_move, state, result in results:
+            totals["games"] += 1
+            totals["moves"] += move_count
+            totals["states"][state] = totals["states"].get(state, 0) + 1
+            if illegal_move is not None:
+                totals["illegal"] += 1
+                output.write("%s: illegal move %d %s->%s\n" % ((game_id,) + illegal_move))
+            elif state != result:
+                totals["mismatched"] += 1
+                output.write("%s: ended %s, recorded as %s\n" % (game_id, state, result))
+    totals["seconds"] = elapsed = time.perf_counter() - start
+
+    output.write("%d games, %d moves in %.3f s: %.1f games/s, %.0f moves/s\n" % (
+        totals["games"], totals["moves"], elapsed, totals["games"] / max(elapsed, 1e-9),
+        totals["moves"] / max(elapsed, 1e-9)))
+    output.write("%d with illegal moves, %d with a different result\n" % (totals["illegal"], totals["mismatched"]))
+    for state in sorted(totals["states"]):
+        output.write("  %-10s %d\n" % (state, totals["states"][state]))
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Janggi games through the rules engine")
+    parser.add_argument("paths", nargs="+", metavar="FILE", help="a game archive or text game record")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of worker processes (0 for one per CPU, the default; 1 for none)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="number of games handed to a worker at a time (default: 64)")
+    args = parser.parse_args()
+
+    totals = validate_files(args.paths, args.workers or None, args.batch_size)
+    sys.exit(1 if totals["illegal"] or totals["mismatched"] else 0)
+
+
+if __name__ == "__main__":
+    main()